@@ -6,6 +6,7 @@ import com.example.vlsi_booking.data.model.BookingOut
 import com.example.vlsi_booking.data.model.ChangePasswordRequest
 import com.example.vlsi_booking.data.model.LoginRequest
 import com.example.vlsi_booking.data.model.LoginResponse
+import com.example.vlsi_booking.data.model.MyBookingsPage
 import retrofit2.http.Body
 import retrofit2.http.GET
 import retrofit2.http.POST
@@ -18,6 +19,13 @@ interface Api {
     @GET("bookings")
     suspend fun getBookings(@Query("day") day: String): List<BookingOut>
 
+    @GET("bookings/mine")
+    suspend fun getMyBookings(
+        @Query("start") start: String,
+        @Query("end") end: String,
+        @Query("after") after: String? = null
+    ): MyBookingsPage
+
     @POST("auth/login")
     suspend fun login(@Body req: LoginRequest): LoginResponse
 
@@ -39,6 +39,8 @@ object ApiClient {
                 }
                 chain.proceed(req)
             }
+            // GET /desks and /bookings answer 304 when nothing changed for the day.
+            .addInterceptor(ConditionalGetInterceptor())
             .addInterceptor(logging)
             .build()
     }
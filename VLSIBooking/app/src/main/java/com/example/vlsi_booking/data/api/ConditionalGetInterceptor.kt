@@ -0,0 +1,54 @@
+package com.example.vlsi_booking.data.api
+
+import okhttp3.Interceptor
+import okhttp3.MediaType
+import okhttp3.Response
+import okhttp3.ResponseBody.Companion.toResponseBody
+
+/**
+ * Remembers the last ETag + body of GET responses and revalidates with If-None-Match.
+ * On 304 the remembered body is replayed as a normal 200, so Retrofit callers don't change.
+ */
+class ConditionalGetInterceptor(private val maxEntries: Int = 32) : Interceptor {
+    private class Entry(val etag: String, val body: ByteArray, val contentType: MediaType?)
+
+    private val cache = object : LinkedHashMap<String, Entry>(16, 0.75f, true) {
+        override fun removeEldestEntry(eldest: MutableMap.MutableEntry<String, Entry>?): Boolean =
+            size > maxEntries
+    }
+
+    override fun intercept(chain: Interceptor.Chain): Response {
+        val request = chain.request()
+        if (request.method != "GET") return chain.proceed(request)
+
+        // Key by user too, so a logout/login never replays someone else's response.
+        val key = request.url.toString() + "|" + (request.header("Authorization") ?: "")
+        val cached = synchronized(cache) { cache[key] }
+
+        val req = if (cached != null) {
+            request.newBuilder().header("If-None-Match", cached.etag).build()
+        } else {
+            request
+        }
+        val response = chain.proceed(req)
+
+        if (response.code == 304 && cached != null) {
+            response.close()
+            return response.newBuilder()
+                .code(200)
+                .message("OK")
+                .body(cached.body.toResponseBody(cached.contentType))
+                .build()
+        }
+
+        val etag = response.header("ETag")
+        val body = response.body
+        if (response.isSuccessful && etag != null && body != null) {
+            val contentType = body.contentType()
+            val bytes = body.bytes()
+            synchronized(cache) { cache[key] = Entry(etag, bytes, contentType) }
+            return response.newBuilder().body(bytes.toResponseBody(contentType)).build()
+        }
+        return response
+    }
+}
@@ -0,0 +1,6 @@
+package com.example.vlsi_booking.data.model
+
+data class MyBookingsPage(
+    val bookings: List<BookingOut>,
+    val next_cursor: String?
+)
@@ -85,8 +85,14 @@ class MainViewModel : ViewModel() {
         viewModelScope.launch {
             _state.value = _state.value.copy(isMyBookingsLoading = true)
             try {
-                val all = ApiClient.api.getBookings(day)
-                val mine = all.filter { it.booked_by == u }
+                // The server filters by the authenticated user.
+                val mine = mutableListOf<BookingOut>()
+                var after: String? = null
+                do {
+                    val page = ApiClient.api.getMyBookings(day, day, after)
+                    mine += page.bookings
+                    after = page.next_cursor
+                } while (after != null)
                 _state.value = _state.value.copy(myBookings = mine, isMyBookingsLoading = false)
             } catch (e: Exception) {
                 _state.value = _state.value.copy(isMyBookingsLoading = false)
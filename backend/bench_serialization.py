@@ -0,0 +1,94 @@
+"""
+CPU cost of encoding GET /desks and GET /bookings bodies, per request.
+
+Compares FastAPI's usual route (pydantic models -> response_model validation
+-> jsonable_encoder -> json.dumps) with the FAST_JSON path (plain dicts ->
+orjson), and checks both give the same bytes.
+
+    python bench_serialization.py [desks ...]
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import main
+from main import BookingOut, DeskStatusOut, DeskType, Slot, render_json
+
+if main.orjson is None:
+    sys.exit("orjson is not installed")
+
+
+def desk_rows(n: int) -> List[dict]:
+    day = date.today()
+    rows = []
+    for i in range(n):
+        desk_type = [DeskType.THESIS, DeskType.STAFF, DeskType.BLOCKED][i % 3]
+        away = desk_type == DeskType.STAFF and i % 2 == 0
+        rows.append({
+            "id": i + 1,
+            "floor_id": i // 1000 + 1,
+            "row": i // 40 + 1,
+            "col": i % 40 + 1,
+            "desk_type": desk_type,
+            "label": f"D{i + 1}",
+            "holder_name": f"Holder {i}" if desk_type == DeskType.STAFF else None,
+            "current_occupant": (f"Temp {i}" if away else f"Holder {i}") if desk_type == DeskType.STAFF else None,
+            "holder_away": away,
+            "away_start": day if away else None,
+            "away_end": day + timedelta(days=3) if away else None,
+            "away_temp_occupant": f"Temp {i}" if away else None,
+            "booking_am": f"student{i}" if desk_type == DeskType.THESIS and i % 2 else None,
+            "booking_pm": f"student{i}" if desk_type == DeskType.THESIS else None,
+        })
+    return rows
+
+
+def booking_rows(n: int) -> List[dict]:
+    day = date.today()
+    return [
+        {"id": i + 1, "desk_id": i // 2 + 1, "day": day, "slot": Slot.AM if i % 2 else Slot.PM, "booked_by": f"student{i}"}
+        for i in range(n)
+    ]
+
+
+def per_call_ms(fn, min_seconds: float = 0.5) -> float:
+    calls = 0
+    started = time.process_time()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.process_time() - started
+        if elapsed >= min_seconds:
+            return 1000 * elapsed / calls
+
+
+def bench(name: str, model, rows: List[dict]) -> None:
+    adapter = TypeAdapter(List[model])
+
+    def fastapi_default() -> bytes:
+        # Handler builds models, FastAPI validates them against response_model and encodes.
+        models = [model(**r) for r in rows]
+        return render_json(jsonable_encoder(adapter.validate_python(models)))
+
+    def fast_json() -> bytes:
+        return main.orjson.dumps(rows)
+
+    assert fastapi_default() == fast_json(), f"{name}: bodies differ"
+    slow = per_call_ms(fastapi_default)
+    fast = per_call_ms(fast_json)
+    print(f"{name:<24} {len(rows):>6} rows  default {slow:8.3f} ms  fast {fast:8.3f} ms  x{slow / fast:5.1f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [24, 500, 5000]
+    for n in sizes:
+        bench("GET /desks", DeskStatusOut, desk_rows(n))
+    for n in sizes:
+        bench("GET /bookings", BookingOut, booking_rows(2 * n))
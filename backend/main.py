@@ -1,17 +1,49 @@
 import asyncio
+import functools
+import inspect
+import logging
+import multiprocessing
 import os
+import queue
 import secrets
+import string
 import hashlib
-
+import html
+import json
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locks, single process assumed
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # optional, only used with FAST_JSON=1
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import date, datetime, timedelta
 from enum import Enum
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Iterable, Set, Callable
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Query, Depends, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Query, Depends, Form, Request, Response
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
+from sqlalchemy import Index, delete, event, exists, func, inspect as sa_inspect, or_, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import SQLModel, Field as SQLField, Session, create_engine, select, UniqueConstraint
 
 # ----------------------------
@@ -38,6 +70,109 @@ INACTIVE_USER_DAYS = _int_env("INACTIVE_USER_DAYS", 365)
 # How often to run the retention cleanup loop (hours)
 CLEANUP_INTERVAL_HOURS = _int_env("CLEANUP_INTERVAL_HOURS", 24)
 
+# Change log (GET /changes) retention (days)
+CHANGELOG_RETENTION_DAYS = _int_env("CHANGELOG_RETENTION_DAYS", 30)
+
+# Rows deleted per transaction by the retention cleanup
+CLEANUP_CHUNK_SIZE = _int_env("CLEANUP_CHUNK_SIZE", 1000)
+
+# How often a non-leader worker retries to become leader (seconds)
+LEADER_RETRY_SECONDS = _int_env("LEADER_RETRY_SECONDS", 60)
+
+# Max number of days served by one GET /desks/range request
+DESK_RANGE_MAX_DAYS = _int_env("DESK_RANGE_MAX_DAYS", 62)
+
+# Floors (POST /floors): max rows / cols of one floor's grid, and the size of
+# the floor created for a fresh database
+FLOOR_MAX_SIDE = _int_env("FLOOR_MAX_SIDE", 100)
+SEED_FLOOR_ROWS = _int_env("SEED_FLOOR_ROWS", 4)
+SEED_FLOOR_COLS = _int_env("SEED_FLOOR_COLS", 6)
+
+# GET /events (Server-Sent Events):
+# - per-connection queue size; a client that falls behind gets a single "resync" event
+# - keepalive comment interval (seconds), also used to notice disconnects
+# - max concurrent subscribers per worker
+# - how often each worker reads the change log for events written by the others (ms)
+EVENTS_QUEUE_SIZE = _int_env("EVENTS_QUEUE_SIZE", 100)
+EVENTS_KEEPALIVE_SECONDS = _int_env("EVENTS_KEEPALIVE_SECONDS", 25)
+EVENTS_MAX_SUBSCRIBERS = _int_env("EVENTS_MAX_SUBSCRIBERS", 5000)
+EVENTS_POLL_MS = _int_env("EVENTS_POLL_MS", 500)
+
+# GET /changes: max changes per page
+CHANGES_PAGE_SIZE = _int_env("CHANGES_PAGE_SIZE", 500)
+
+# Response compression (gzip, or brotli when installed and accepted):
+# - bodies smaller than COMPRESS_MIN_BYTES are sent as is (0 disables compression)
+# - gzip level 1-9, brotli quality 0-11
+COMPRESS_MIN_BYTES = _int_env("COMPRESS_MIN_BYTES", 1024)
+COMPRESS_LEVEL = _int_env("COMPRESS_LEVEL", 6)
+COMPRESS_BROTLI_QUALITY = _int_env("COMPRESS_BROTLI_QUALITY", 5)
+
+# Max number of items in one POST /bookings/batch request
+BOOKING_BATCH_MAX_ITEMS = _int_env("BOOKING_BATCH_MAX_ITEMS", 50)
+
+# Encode GET /desks, /bookings and /bookings/mine from plain dicts with orjson
+# instead of building pydantic models and using the stdlib encoder (same bytes).
+# Needs `pip install orjson`; ignored when it isn't installed.
+FAST_JSON = _int_env("FAST_JSON", 0) == 1
+USE_FAST_JSON = FAST_JSON and orjson is not None
+
+# Group commit for POST /bookings and DELETE /bookings/{id}: writes arriving
+# within BOOKING_GROUP_COMMIT_MS of the first one share a single transaction
+# (at most BOOKING_GROUP_COMMIT_MAX writes). 0 = one transaction per request.
+BOOKING_GROUP_COMMIT_MS = _int_env("BOOKING_GROUP_COMMIT_MS", 0)
+BOOKING_GROUP_COMMIT_MAX = _int_env("BOOKING_GROUP_COMMIT_MAX", 64)
+
+# In-process cache of GET /desks snapshots.
+# - max snapshots kept (LRU, one per day and floor view); 0 disables the cache
+# - optional TTL (seconds); entries are already checked against the DB day version
+# - how many working days (after today) to pre-warm at startup / midnight
+DESK_CACHE_MAX_DAYS = _int_env("DESK_CACHE_MAX_DAYS", 64)
+DESK_CACHE_TTL_SECONDS = _int_env("DESK_CACHE_TTL_SECONDS", 0)
+DESK_CACHE_PREWARM_DAYS = _int_env("DESK_CACHE_PREWARM_DAYS", 5)
+
+# Rendered /admin/desks cells kept per worker (one per desk and day, LRU);
+# 0 disables the cache.
+ADMIN_CELL_CACHE_MAX = _int_env("ADMIN_CELL_CACHE_MAX", 20000)
+
+# In-process cache of validated bearer tokens (require_user); a TTL of 0 disables it.
+# Revocations reach the other workers through the TokenRevocation log, which a
+# worker reads before trusting a cached token if it hasn't for TOKEN_CACHE_SYNC_MS:
+# deliberately, a token revoked on another worker stays usable for up to that
+# long (0 = read it on every request).
+TOKEN_CACHE_MAX = _int_env("TOKEN_CACHE_MAX", 10_000)
+TOKEN_CACHE_TTL_SECONDS = _int_env("TOKEN_CACHE_TTL_SECONDS", 60)
+TOKEN_CACHE_SYNC_MS = _int_env("TOKEN_CACHE_SYNC_MS", 1000)
+
+# Password hashing (PBKDF2) runs on a small process pool so login bursts don't
+# starve the request threadpool. 0 workers = hash inline.
+# At most PWD_HASH_MAX_PENDING hashes may be queued/running; extra requests get a 503.
+PWD_HASH_WORKERS = _int_env("PWD_HASH_WORKERS", 2)
+PWD_HASH_MAX_PENDING = _int_env("PWD_HASH_MAX_PENDING", 16)
+
+
+# Serve the read and booking endpoints as async handlers over SQLAlchemy's
+# asyncio engine (aiosqlite / psycopg async) instead of the request threadpool.
+# 0 = sync handlers (default). SQLite needs `pip install aiosqlite`.
+DB_ASYNC = _int_env("DB_ASYNC", 0) == 1
+
+# SQLite performance profile (opt-in, SQLITE_PROFILE=1): WAL journal with
+# synchronous=NORMAL, a busy timeout so concurrent writers wait for the lock
+# instead of failing, memory-mapped reads, a bigger page cache, in-memory temp
+# tables, and a connection pool sized for concurrent WAL readers.
+SQLITE_PROFILE = _int_env("SQLITE_PROFILE", 0) == 1
+SQLITE_BUSY_TIMEOUT_MS = _int_env("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_MMAP_SIZE_MB = _int_env("SQLITE_MMAP_SIZE_MB", 256)
+SQLITE_CACHE_SIZE_MB = _int_env("SQLITE_CACHE_SIZE_MB", 64)
+SQLITE_POOL_SIZE = _int_env("SQLITE_POOL_SIZE", 8)
+
+# The leader refreshes planner statistics with every retention cleanup (see
+# refresh_planner_stats); 0 leaves them to the operator. SQLite loads them when
+# a connection opens, so while the refresh is on, file-backed SQLite pools
+# reopen their connections after SQLITE_STATS_RELOAD_SECONDS (0 = never).
+PLANNER_STATS_REFRESH = _int_env("PLANNER_STATS_REFRESH", 1) == 1
+SQLITE_STATS_RELOAD_SECONDS = _int_env("SQLITE_STATS_RELOAD_SECONDS", 3600)
+
 
 def get_database_url() -> str:
     """Resolve DB URL from env, with a local SQLite default."""
@@ -58,11 +193,90 @@ def get_database_url() -> str:
 
 DB_URL = get_database_url()
 
-if DB_URL.startswith("sqlite:"):
-    engine = create_engine(DB_URL, echo=False, connect_args={"check_same_thread": False})
+IS_SQLITE = DB_URL.startswith("sqlite:")
+# In-memory databases can't use WAL and live in a single connection anyway.
+IS_SQLITE_FILE = IS_SQLITE and ":memory:" not in DB_URL and DB_URL != "sqlite://"
+USE_SQLITE_PROFILE = SQLITE_PROFILE and IS_SQLITE_FILE
+
+
+def sqlite_pool_args() -> dict:
+    args: dict = {}
+    if IS_SQLITE_FILE and PLANNER_STATS_REFRESH and SQLITE_STATS_RELOAD_SECONDS > 0:
+        args["pool_recycle"] = SQLITE_STATS_RELOAD_SECONDS
+    if USE_SQLITE_PROFILE:
+        # WAL lets readers run alongside the single writer, so keep enough
+        # connections around for them; overflow covers bursts.
+        size = max(1, SQLITE_POOL_SIZE)
+        args.update(pool_size=size, max_overflow=size, pool_timeout=30)
+    return args
+
+
+def sqlite_pragmas() -> List[str]:
+    return [
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        f"busy_timeout={max(0, SQLITE_BUSY_TIMEOUT_MS)}",
+        f"mmap_size={max(0, SQLITE_MMAP_SIZE_MB) * 1024 * 1024}",
+        f"cache_size=-{max(0, SQLITE_CACHE_SIZE_MB) * 1024}",  # negative = KiB
+        "temp_store=MEMORY",
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(f"PRAGMA {pragma}")
+    finally:
+        cursor.close()
+
+
+if IS_SQLITE:
+    engine = create_engine(DB_URL, echo=False, connect_args={"check_same_thread": False}, **sqlite_pool_args())
 else:
     engine = create_engine(DB_URL, echo=False, pool_pre_ping=True)
 
+if USE_SQLITE_PROFILE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+
+def get_async_database_url(url: str) -> str:
+    """Same database, async driver."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    # postgresql+psycopg picks psycopg's async connection under create_async_engine.
+    return url
+
+
+async_engine = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.util.concurrency import await_only, in_greenlet
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    if IS_SQLITE:
+        async_engine = create_async_engine(get_async_database_url(DB_URL), echo=False, **sqlite_pool_args())
+    else:
+        async_engine = create_async_engine(get_async_database_url(DB_URL), echo=False, pool_pre_ping=True)
+
+    if USE_SQLITE_PROFILE:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+def database_settings_report() -> dict:
+    """Effective connection settings, as seen by a fresh pooled connection."""
+    report: dict = {"dialect": engine.dialect.name, "async": DB_ASYNC, "pool": engine.pool.status()}
+    if IS_SQLITE:
+        report["sqlite_profile"] = USE_SQLITE_PROFILE
+        with engine.connect() as conn:
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "temp_store"):
+                report[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    return report
+
+
+# Filled in at startup; also shown by GET /admin/stats.
+database_settings: dict = {}
+
 # Admin credentials (set via env in production!)
 # Example:
 #   export LAB_ADMIN_USER="admin"
@@ -126,8 +340,22 @@ class Slot(str, Enum):
     PM = "PM"
 
 
+class Floor(SQLModel, table=True):
+    """A floor or room: its own rows x cols grid of desks."""
+    id: Optional[int] = SQLField(default=None, primary_key=True)
+    name: str = SQLField(unique=True, max_length=80)
+    rows: int
+    cols: int
+
+
 class Desk(SQLModel, table=True):
+    __table_args__ = (
+        # Per-floor reads (GET /desks?floor=, the admin grid) in grid order.
+        Index("ix_desk_floor_row_col", "floor_id", "row", "col"),
+    )
+
     id: Optional[int] = SQLField(default=None, primary_key=True)
+    floor_id: Optional[int] = SQLField(default=None, foreign_key="floor.id")
     row: int
     col: int
     desk_type: DeskType = SQLField(index=True)
@@ -137,15 +365,18 @@ class Desk(SQLModel, table=True):
 
 class Booking(SQLModel, table=True):
     __table_args__ = (
+        # The unique constraints double as the (desk_id, ...) and (booked_by, day, ...)
+        # indexes; ix_booking_day_slot_desk serves per-day reads in list order.
         UniqueConstraint("desk_id", "day", "slot", name="uq_desk_day_slot"),
         UniqueConstraint("booked_by", "day", "slot", name="uq_person_day_slot"),
+        Index("ix_booking_day_slot_desk", "day", "slot", "desk_id"),
     )
 
     id: Optional[int] = SQLField(default=None, primary_key=True)
-    desk_id: int = SQLField(foreign_key="desk.id", index=True)
-    day: date = SQLField(index=True)
-    slot: Slot = SQLField(index=True)
-    booked_by: str = SQLField(index=True, max_length=80)
+    desk_id: int = SQLField(foreign_key="desk.id")
+    day: date
+    slot: Slot
+    booked_by: str = SQLField(max_length=80)
 
 
 class StaffCoverage(SQLModel, table=True):
@@ -154,16 +385,44 @@ class StaffCoverage(SQLModel, table=True):
 
     Rules:
     - Intended for STAFF desks
-    - We prevent overlapping coverages for the same desk (checked in code)
+    - Coverages of the same desk never overlap (insert_coverage; an exclusion
+      constraint on Postgres)
     """
+    __table_args__ = (
+        Index("ix_staffcoverage_desk_range", "desk_id", "start_day", "end_day"),
+    )
+
     id: Optional[int] = SQLField(default=None, primary_key=True)
-    desk_id: int = SQLField(foreign_key="desk.id", index=True)
+    desk_id: int = SQLField(foreign_key="desk.id")
     start_day: date = SQLField(index=True)
     end_day: date = SQLField(index=True)
     temp_occupant: str = SQLField(index=True, max_length=80)
     note: str = SQLField(default="", max_length=200)
 
 
+class DayVersion(SQLModel, table=True):
+    """
+    Change counter per day, bumped in the same transaction as every write that
+    affects what GET /desks or GET /bookings return for that day.
+    The row for GLOBAL_VERSION_DAY covers changes affecting every day.
+    """
+    day: date = SQLField(primary_key=True)
+    version: int = 0
+
+
+class ChangeLog(SQLModel, table=True):
+    """
+    Append-only log of booking/desk/coverage mutations (GET /changes), written
+    in the same transaction as the mutation. `payload` is the JSON event, in
+    the same shape as the /events stream.
+    """
+    id: Optional[int] = SQLField(default=None, primary_key=True)
+    created_at: datetime = SQLField(index=True)
+    kind: str = SQLField(max_length=32)
+    booked_by: Optional[str] = SQLField(default=None, index=True, max_length=80)  # for user deletion
+    payload: str
+
+
 class AuthToken(SQLModel, table=True):
     token: str = SQLField(primary_key=True)
     username: str = SQLField(index=True, max_length=80)
@@ -171,6 +430,18 @@ class AuthToken(SQLModel, table=True):
     expires_at: datetime = SQLField(index=True)
 
 
+class TokenRevocation(SQLModel, table=True):
+    """
+    Append-only log of revoked bearer tokens, written in the same transaction
+    as the revocation and read by every worker's token_cache (TokenCache.sync).
+    `token` None revokes all of the user's tokens.
+    """
+    id: Optional[int] = SQLField(default=None, primary_key=True)
+    created_at: datetime = SQLField(index=True)
+    username: str = SQLField(max_length=80)
+    token: Optional[str] = None
+
+
 class User(SQLModel, table=True):
     username: str = SQLField(primary_key=True, max_length=80)
     password_salt_hex: str = SQLField(max_length=64)
@@ -178,6 +449,13 @@ class User(SQLModel, table=True):
     created_at: datetime = SQLField(index=True)
 
 
+class SchemaMigration(SQLModel, table=True):
+    """Applied entries of MIGRATIONS."""
+    version: int = SQLField(primary_key=True)
+    name: str = SQLField(max_length=120)
+    applied_at: datetime
+
+
 # ----------------------------
 # API Schemas
 # ----------------------------
@@ -197,8 +475,42 @@ class BookingOut(BaseModel):
     booked_by: str
 
 
+class MyBookingsOut(BaseModel):
+    bookings: List[BookingOut]
+    # Pass as `after` to get the next page; None when there are no more.
+    next_cursor: Optional[str] = None
+
+
+class BookingBatchItem(BaseModel):
+    desk_id: int
+    day: date
+    slot: Slot
+
+
+class BookingBatchCreate(BaseModel):
+    items: List[BookingBatchItem] = Field(min_length=1, max_length=BOOKING_BATCH_MAX_ITEMS)
+    # If true, nothing is booked unless every item can be booked.
+    all_or_nothing: bool = False
+
+
+class BookingBatchResult(BaseModel):
+    desk_id: int
+    day: date
+    slot: Slot
+    status: str  # "created" | "conflict" | "invalid" | "skipped" (all_or_nothing)
+    detail: Optional[str] = None
+    booking: Optional[BookingOut] = None
+
+
+class BookingBatchOut(BaseModel):
+    ok: bool  # every item was created
+    created: int
+    results: List[BookingBatchResult]
+
+
 class DeskStatusOut(BaseModel):
     id: int
+    floor_id: Optional[int] = None
     row: int
     col: int
     desk_type: DeskType
@@ -217,6 +529,67 @@ class DeskStatusOut(BaseModel):
     booking_pm: Optional[str] = None
 
 
+class DeskInfoOut(BaseModel):
+    id: int
+    floor_id: Optional[int] = None
+    row: int
+    col: int
+    desk_type: DeskType
+    label: str
+    holder_name: Optional[str] = None
+
+
+class FloorOut(BaseModel):
+    id: int
+    name: str
+    rows: int
+    cols: int
+    desks: int
+
+
+class FloorCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=80)
+    rows: int = Field(ge=1, le=FLOOR_MAX_SIDE)
+    cols: int = Field(ge=1, le=FLOOR_MAX_SIDE)
+    # Every cell gets a desk of this type; edit them afterwards like any other desk.
+    desk_type: DeskType = DeskType.THESIS
+
+
+class CoverageSpanOut(BaseModel):
+    start_day: date
+    end_day: date
+    temp_occupant: str
+
+
+class DeskRangeOut(BaseModel):
+    start: date
+    end: date
+    days: List[date]
+    desks: List[DeskInfoOut]
+    coverages: List[CoverageSpanOut]
+
+    # Matrices are indexed [day][desk], aligned with `days` and `desks`.
+    # booking_* are set for THESIS desks; coverage is an index into `coverages` for STAFF desks.
+    booking_am: List[List[Optional[str]]]
+    booking_pm: List[List[Optional[str]]]
+    coverage: List[List[Optional[int]]]
+
+
+class ChangeOut(BaseModel):
+    id: int
+    created_at: datetime
+    type: str
+    data: dict
+
+
+class ChangesOut(BaseModel):
+    cursor: int  # pass as `since` on the next call
+    has_more: bool
+    # True if `since` is older than the retained log: refetch the days you cache.
+    reset: bool
+    changes: List[ChangeOut]
+
+
 class CancelRequest(BaseModel):
     booked_by: str = Field(min_length=1, max_length=80)
 
@@ -264,65 +637,667 @@ class DeleteAccountRequest(BaseModel):
     password: str = Field(min_length=1, max_length=200)
 
 
+# ----------------------------
+# Schema migrations
+# ----------------------------
+def _migrate_initial_schema(conn) -> None:
+    # New databases get the current models (including later indexes) in one go,
+    # so later migrations must also work on a schema created here.
+    SQLModel.metadata.create_all(conn)
+
+
+def _migrate_hot_path_indexes(conn) -> None:
+    for stmt in (
+        # WHERE day = ? [ORDER BY slot, desk_id]: GET /desks, GET /bookings, cleanup
+        "CREATE INDEX IF NOT EXISTS ix_booking_day_slot_desk ON booking (day, slot, desk_id)",
+        # WHERE desk_id = ? AND start_day <= ? AND end_day >= ?: overlap checks
+        "CREATE INDEX IF NOT EXISTS ix_staffcoverage_desk_range ON staffcoverage (desk_id, start_day, end_day)",
+        # Prefixes of the indexes above or of the unique constraints; they only slowed down writes.
+        "DROP INDEX IF EXISTS ix_booking_day",
+        "DROP INDEX IF EXISTS ix_booking_slot",
+        "DROP INDEX IF EXISTS ix_booking_desk_id",
+        "DROP INDEX IF EXISTS ix_booking_booked_by",
+        "DROP INDEX IF EXISTS ix_staffcoverage_desk_id",
+    ):
+        conn.exec_driver_sql(stmt)
+
+
+def _check_no_coverage_overlaps(conn) -> None:
+    """
+    Fails the migration if any desk has overlapping coverages: written before
+    overlaps were rejected, they would break the exclusion constraint and the
+    single-seek check_coverage_overlap.
+    """
+    a = StaffCoverage.__table__.alias("a")
+    b = StaffCoverage.__table__.alias("b")
+    pairs = conn.execute(
+        select(a.c.desk_id, a.c.id, b.c.id)
+        .where(
+            a.c.desk_id == b.c.desk_id,
+            a.c.id < b.c.id,
+            a.c.start_day <= b.c.end_day,
+            b.c.start_day <= a.c.end_day,
+        )
+        .order_by(a.c.desk_id, a.c.id, b.c.id)
+    ).all()
+    if pairs:
+        listed = "; ".join(f"desk {desk_id}: coverages {x} and {y}" for desk_id, x, y in pairs[:20])
+        more = f" (and {len(pairs) - 20} more)" if len(pairs) > 20 else ""
+        raise RuntimeError(
+            f"staffcoverage has {len(pairs)} overlapping coverage pair(s): {listed}{more}. "
+            "Delete or shorten one coverage of each pair (DELETE /coverages/{id} on the "
+            "previous release, or SQL), then restart."
+        )
+
+
+def _migrate_coverage_exclusion(conn) -> None:
+    # Postgres enforces non-overlapping coverages per desk itself (see insert_coverage);
+    # SQLite serializes writers instead.
+    if conn.dialect.name != "postgresql":
+        return
+    exists_already = conn.exec_driver_sql(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'ex_staffcoverage_no_overlap'"
+    ).first()
+    if exists_already:
+        return
+    _check_no_coverage_overlaps(conn)
+    conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    conn.exec_driver_sql(
+        "ALTER TABLE staffcoverage ADD CONSTRAINT ex_staffcoverage_no_overlap "
+        "EXCLUDE USING gist (desk_id WITH =, daterange(start_day, end_day, '[]') WITH &&)"
+    )
+
+
+# Floor created for a fresh database, and for desks that predate floors.
+DEFAULT_FLOOR_NAME = "Lab"
+
+
+def _migrate_floors(conn) -> None:
+    Floor.__table__.create(conn, checkfirst=True)
+    if "floor_id" not in {c["name"] for c in sa_inspect(conn).get_columns("desk")}:
+        conn.exec_driver_sql("ALTER TABLE desk ADD COLUMN floor_id INTEGER REFERENCES floor (id)")
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_desk_floor_row_col ON desk (floor_id, "row", col)')
+
+    # Existing desks move onto one floor sized to fit them.
+    count, max_row, max_col = conn.execute(
+        select(func.count(), func.max(Desk.row), func.max(Desk.col)).where(Desk.floor_id.is_(None))
+    ).one()
+    if count:
+        floor_id = conn.execute(
+            Floor.__table__.insert().values(name=DEFAULT_FLOOR_NAME, rows=max_row + 1, cols=max_col + 1)
+        ).inserted_primary_key[0]
+        conn.execute(update(Desk.__table__).where(Desk.floor_id.is_(None)).values(floor_id=floor_id))
+
+
+def _migrate_token_revocations(conn) -> None:
+    TokenRevocation.__table__.create(conn, checkfirst=True)
+
+
+# (version, name, fn(connection)). Append only; never edit an applied entry.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "initial schema", _migrate_initial_schema),
+    (2, "hot-path composite indexes", _migrate_hot_path_indexes),
+    (3, "coverage overlap exclusion constraint", _migrate_coverage_exclusion),
+    (4, "floors", _migrate_floors),
+    (5, "token revocation log", _migrate_token_revocations),
+    # Migration 3 is a no-op on SQLite; this checks its invariant there too.
+    (6, "check coverages don't overlap", _check_no_coverage_overlaps),
+]
+
+
+def run_migrations() -> List[int]:
+    """
+    Applies pending MIGRATIONS in order, each in its own transaction together
+    with its schema_migration row. Only the leader calls this.
+    """
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session:
+        applied = set(session.exec(select(SchemaMigration.version)).all())
+
+    done: List[int] = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                SchemaMigration.__table__.insert().values(version=version, name=name, applied_at=datetime.utcnow())
+            )
+        done.append(version)
+    return done
+
+
+# Tables the leader keeps planner statistics for (see refresh_planner_stats).
+PLANNER_STATS_TABLES = ("booking", "staffcoverage", "desk", "changelog", "authtoken")
+# SQLite: smaller tables are left to the planner's defaults, which use the
+# indexes; statistics of a handful of rows would make it prefer scans.
+PLANNER_STATS_MIN_ROWS = 1000
+
+
+def refresh_planner_stats() -> dict:
+    """
+    Keeps the planner statistics in step with the table sizes. The leader runs
+    it with every retention cleanup (startup + periodic loop), so statistics
+    taken on a small table don't stay frozen as it grows.
+
+    SQLite: ANALYZEs the tables of at least PLANNER_STATS_MIN_ROWS rows whose
+    statistics are missing or count less than half / more than twice their
+    rows. Connections load statistics when they open, so after an ANALYZE
+    this worker's pool starts over; the other workers' pools recycle
+    (SQLITE_STATS_RELOAD_SECONDS).
+    """
+    analyzed: List[str] = []
+    with engine.begin() as conn:
+        if engine.dialect.name != "sqlite":
+            for table in PLANNER_STATS_TABLES:
+                conn.exec_driver_sql(f"ANALYZE {table}")
+            return {"analyzed": list(PLANNER_STATS_TABLES)}
+
+        # sqlite_stat1's stat column starts with the row count at the last ANALYZE.
+        counted: Dict[str, int] = {}
+        if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first():
+            for tbl, stat in conn.exec_driver_sql("SELECT tbl, stat FROM sqlite_stat1"):
+                counted[tbl] = int(stat.split()[0])
+
+        # Bounds the cost of ANALYZE on big tables (rows sampled per index).
+        conn.exec_driver_sql("PRAGMA analysis_limit = 1000")
+        for table in PLANNER_STATS_TABLES:
+            rows = conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+            if rows < PLANNER_STATS_MIN_ROWS:
+                continue
+            if table not in counted or not counted[table] / 2 <= rows <= counted[table] * 2:
+                conn.exec_driver_sql(f"ANALYZE {table}")
+                analyzed.append(table)
+    if analyzed:
+        engine.dispose()
+    return {"analyzed": analyzed}
+
+
+def hot_queries() -> Dict[str, object]:
+    """The statements behind the hot endpoints, with representative parameters."""
+    day = date.today()
+    return {
+        "desks: bookings of a day": select(Booking).where(Booking.day == day),
+        "desks: desks of a floor": select_desks(1),
+        "desks: bookings of a floor": select(Booking)
+        .where(Booking.day == day, Booking.desk_id.in_(floor_desk_ids(1))),
+        "desks: coverages of a floor": select(StaffCoverage)
+        .where(StaffCoverage.start_day <= day, StaffCoverage.end_day >= day, StaffCoverage.desk_id.in_(floor_desk_ids(1))),
+        "list_bookings": select(Booking).where(Booking.day == day).order_by(Booking.slot, Booking.desk_id),
+        "list_my_bookings": select(Booking)
+        .where(Booking.booked_by == "user", Booking.day >= day, Booking.day <= day + timedelta(days=30))
+        .order_by(Booking.day, Booking.slot),
+        "export_user_data": select(Booking)
+        .where(Booking.booked_by == "user")
+        .order_by(Booking.day, Booking.slot, Booking.desk_id),
+        "load_active_coverages": select(StaffCoverage)
+        .where(StaffCoverage.start_day <= day, StaffCoverage.end_day >= day),
+        "check_coverage_overlap": select(StaffCoverage.end_day)
+        .where(StaffCoverage.desk_id == 1, StaffCoverage.start_day <= day)
+        .order_by(StaffCoverage.start_day.desc())
+        .limit(1),
+        "get_changes": select(ChangeLog).where(ChangeLog.id > 0).order_by(ChangeLog.id),
+        "cleanup: old bookings": select(Booking.id).where(Booking.day < day),
+    }
+
+
+def explain_hot_queries() -> Dict[str, dict]:
+    """
+    EXPLAINs hot_queries() and flags the ones that would read a whole table.
+
+    On Postgres sequential scans are disabled for the check, because the
+    planner rightly prefers them on small tables: a "Seq Scan" that survives
+    that means no index can serve the query.
+    """
+    report: Dict[str, dict] = {}
+    with engine.connect() as conn:
+        with conn.begin():
+            if engine.dialect.name == "postgresql":
+                conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for name, stmt in hot_queries().items():
+                sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+                if engine.dialect.name == "sqlite":
+                    plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+                    full_scan = any(
+                        step.startswith("SCAN ") and " INDEX " not in step for step in plan
+                    )
+                    sort = any("TEMP B-TREE" in step for step in plan)
+                else:
+                    plan = [row[0] for row in conn.exec_driver_sql("EXPLAIN " + sql)]
+                    full_scan = any("Seq Scan" in step for step in plan)
+                    sort = any(step.lstrip(" ->").startswith("Sort") for step in plan)
+                report[name] = {"full_scan": full_scan, "sort": sort, "plan": plan}
+            conn.rollback()
+    return report
+
+
+def schema_self_check() -> dict:
+    """Schema version plus the EXPLAIN check; logged at startup and shown in /admin/stats."""
+    with Session(engine) as session:
+        versions = session.exec(select(SchemaMigration.version)).all()
+    explain = explain_hot_queries()
+    return {
+        "version": max(versions, default=0),
+        "latest": MIGRATIONS[-1][0],
+        "full_scans": [name for name, r in explain.items() if r["full_scan"]],
+        "explain": explain,
+    }
+
+
+# Filled in at startup.
+schema_report: dict = {}
+
+
 # ----------------------------
 # App lifecycle
 # ----------------------------
+class LeaderLock:
+    """
+    Elects a single process (across uvicorn workers) to run schema creation,
+    seeding and retention cleanup.
+
+    - Postgres: session-level advisory lock held on a dedicated connection
+    - SQLite: exclusive flock on a file next to the DB
+
+    Both are released by the server/OS when the holder dies, so a follower's
+    next try_acquire() takes over.
+    """
+
+    PG_LOCK_KEY = 0x564C5349  # "VLSI"
+
+    def __init__(self, db_url: str):
+        self.db_url = db_url
+        self.is_leader = False
+        self._conn = None
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        if self.is_leader:
+            return self.verify()
+        if self.db_url.startswith("sqlite:"):
+            self.is_leader = self._acquire_file_lock()
+        else:
+            self.is_leader = self._acquire_advisory_lock()
+        return self.is_leader
+
+    def _acquire_file_lock(self) -> bool:
+        db_path = engine.url.database
+        if fcntl is None or not db_path or db_path == ":memory:":
+            return True
+        f = open(db_path + ".leader.lock", "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def _acquire_advisory_lock(self) -> bool:
+        try:
+            conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        except Exception:
+            return False
+        try:
+            ok = bool(conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.PG_LOCK_KEY}).scalar())
+        except Exception:
+            ok = False
+        if not ok:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def verify(self) -> bool:
+        """For Postgres, make sure the lock connection is still alive."""
+        if self.is_leader and self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+            except Exception:
+                self.release()
+        return self.is_leader
+
+    def release(self) -> None:
+        self.is_leader = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+leader = LeaderLock(DB_URL)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
-    seed_if_empty()
-    cleanup_old_data()
+    password_hasher.start()
+    event_hub.bind(asyncio.get_running_loop())
+
+    log = logging.getLogger("uvicorn.error")
+
+    # Only the leader migrates/seeds the schema and runs retention.
+    if await asyncio.to_thread(leader.try_acquire):
+        applied = await asyncio.to_thread(run_migrations)
+        if applied:
+            log.info("Applied schema migrations: %s", applied)
+        await asyncio.to_thread(seed_if_empty)
+        await asyncio.to_thread(cleanup_old_data)
+
+    global database_settings, schema_report
+    database_settings = await asyncio.to_thread(database_settings_report)
+    log.info("Database settings: %s", database_settings)
+
+    try:
+        schema_report = await asyncio.to_thread(schema_self_check)
+        if schema_report["full_scans"]:
+            log.warning("Hot queries without a usable index: %s", schema_report["full_scans"])
+    except Exception:
+        # Followers may start before the leader has created the schema.
+        pass
+
+    try:
+        await asyncio.to_thread(prewarm_desk_cache)
+    except Exception:
+        # Followers may start before the leader has created the schema.
+        pass
 
     async def _periodic_cleanup() -> None:
         # Best-effort loop: never crash the app due to cleanup.
+        # Followers poll for leadership, so a dead leader is replaced quickly.
         interval = max(1, CLEANUP_INTERVAL_HOURS) * 3600
+        next_run = time.monotonic() + interval
         while True:
-            await asyncio.sleep(interval)
+            if leader.is_leader:
+                await asyncio.sleep(max(0.0, next_run - time.monotonic()))
+                if not await asyncio.to_thread(leader.verify):
+                    continue
+            else:
+                await asyncio.sleep(max(1, LEADER_RETRY_SECONDS))
+                if not await asyncio.to_thread(leader.try_acquire):
+                    continue
+            if time.monotonic() < next_run:
+                continue
+            next_run = time.monotonic() + interval
             try:
-                cleanup_old_data()
+                await asyncio.to_thread(cleanup_old_data)
             except Exception:
                 # Avoid leaking PII into logs; keep it silent.
                 pass
 
-    task = asyncio.create_task(_periodic_cleanup())
+    async def _midnight_rollover() -> None:
+        # Drop past days from the desk cache and warm the new working week.
+        while True:
+            now = datetime.now()
+            next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            await asyncio.sleep((next_midnight - now).total_seconds() + 1)
+            try:
+                desk_cache.evict_before(date.today())
+                await asyncio.to_thread(prewarm_desk_cache)
+            except Exception:
+                pass
+
+    tasks = [
+        asyncio.create_task(_periodic_cleanup()),
+        asyncio.create_task(_midnight_rollover()),
+        asyncio.create_task(event_hub.run()),
+    ]
     yield
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    password_hasher.shutdown()
+    booking_writes.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    leader.release()
 
 
 app = FastAPI(title="Lab Desk Booking + Admin + Coverage", lifespan=lifespan)
 
 
+# ----------------------------
+# Response compression
+# ----------------------------
+COMPRESSIBLE_TYPES = ("text/html", "text/plain", "text/css", "application/json", "application/msgpack")
+
+
+def accepted_values(header: str) -> Set[str]:
+    """Values listed in an Accept / Accept-Encoding header, lowercased; q=0 excludes."""
+    accepted: Set[str] = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of br/gzip allowed by an Accept-Encoding header (q=0 excludes)."""
+    accepted = accepted_values(accept_encoding)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of the compressed representation: `"v"` -> `"v-gzip"` (W/ stays)."""
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_etag_encoding(etag: str) -> str:
+    """Inverse of encoded_etag, so handlers can compare with their own tags."""
+    for encoding in ("gzip", "br"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def if_none_match_has(if_none_match: str, etag: str) -> bool:
+    return any(c.strip().removeprefix("W/") == etag.removeprefix("W/") for c in if_none_match.split(","))
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=min(11, max(0, COMPRESS_BROTLI_QUALITY)))
+        else:
+            # wbits 16+MAX_WBITS = gzip container
+            self._zlib = zlib.compressobj(min(9, max(1, COMPRESS_LEVEL)), zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        # Intermediate chunks are flushed so streamed pages still render progressively.
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.skipped = 0
+        self._by_encoding: Dict[str, Dict[str, int]] = {}
+
+    def add(self, encoding: str, raw: int, sent: int, responses: int = 0) -> None:
+        with self._lock:
+            entry = self._by_encoding.setdefault(encoding, {"responses": 0, "raw_bytes": 0, "sent_bytes": 0})
+            entry["responses"] += responses
+            entry["raw_bytes"] += raw
+            entry["sent_bytes"] += sent
+
+    def skip(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            raw = sum(e["raw_bytes"] for e in self._by_encoding.values())
+            sent = sum(e["sent_bytes"] for e in self._by_encoding.values())
+            return {
+                "min_bytes": COMPRESS_MIN_BYTES,
+                "level": COMPRESS_LEVEL,
+                "brotli": brotli is not None,
+                "skipped": self.skipped,
+                "raw_bytes": raw,
+                "sent_bytes": sent,
+                "ratio": round(sent / raw, 3) if raw else None,
+                "by_encoding": {k: dict(v) for k, v in self._by_encoding.items()},
+            }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    Compresses text/JSON/MessagePack responses when the client accepts it.
+
+    A complete body under COMPRESS_MIN_BYTES (e.g. /health, 304s) is passed
+    through untouched. Streamed bodies are compressed chunk by chunk.
+    Server-Sent Events and already-encoded responses are never touched.
+
+    Compressible responses always carry `Vary: Accept-Encoding`, compressed
+    or not, and a compressed body gets its own ETag (see encoded_etag); a 304
+    echoes the tag the client revalidated with.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or COMPRESS_MIN_BYTES <= 0:
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+
+        start_message: Optional[dict] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message) -> None:
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            # Whatever comes after the start (a body, or e.g. a
+            # http.response.pathsend) decides the headers, and the held-back
+            # start always goes out first.
+            if passthrough or (encoder is not None and message["type"] != "http.response.body"):
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+                not_modified = start_message["status"] == 304
+                compressible = "content-encoding" not in headers and (
+                    content_type in COMPRESSIBLE_TYPES or (not_modified and "etag" in headers)
+                )
+                if compressible:
+                    # Shared caches must key these on Accept-Encoding even
+                    # when this particular response goes out uncompressed.
+                    headers.add_vary_header("Accept-Encoding")
+                if (
+                    not compressible
+                    or encoding is None
+                    or not_modified
+                    or message["type"] != "http.response.body"
+                    or (not more_body and len(body) < COMPRESS_MIN_BYTES)
+                ):
+                    passthrough = True
+                    if encoding is not None:
+                        compression_stats.skip()
+                    if compressible and not_modified and encoding is not None:
+                        etag = encoded_etag(headers["etag"], encoding)
+                        if if_none_match_has(request_headers.get("if-none-match", ""), etag):
+                            headers["ETag"] = etag
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if not more_body:
+                    data = encoder.encode(body, final=True)
+                    headers["Content-Length"] = str(len(data))
+                    compression_stats.add(encoding, len(body), len(data), responses=1)
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                del headers["Content-Length"]
+                await send(start_message)
+                compression_stats.add(encoding, 0, 0, responses=1)
+
+            data = encoder.encode(body, final=not more_body)
+            compression_stats.add(encoding, len(body), len(data))
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+app.add_middleware(CompressionMiddleware)
+
+
 # ----------------------------
 # Helpers
 # ----------------------------
 def seed_if_empty() -> None:
-    """Create a 4x6 grid if there are no desks in the DB."""
+    """Create one SEED_FLOOR_ROWS x SEED_FLOOR_COLS floor (4x6 by default) if there are no desks in the DB."""
     with Session(engine) as session:
         existing = session.exec(select(Desk)).first()
         if existing:
             return
 
+        floor = session.exec(select(Floor).where(Floor.name == DEFAULT_FLOOR_NAME)).first()
+        if floor is None:
+            floor = Floor(name=DEFAULT_FLOOR_NAME, rows=max(1, SEED_FLOOR_ROWS), cols=max(1, SEED_FLOOR_COLS))
+            session.add(floor)
+            session.flush()
+
         desks: List[Desk] = []
-        for r in range(4):
-            for c in range(6):
+        for r in range(floor.rows):
+            for c in range(floor.cols):
                 if r in (0, 1):
                     t = DeskType.STAFF
-                elif r == 2:
-                    t = DeskType.THESIS
                 else:
                     t = DeskType.THESIS
-                    if c in (0, 5):
+                    # Last row of the lab: the corner desks are blocked.
+                    if r >= 3 and r == floor.rows - 1 and c in (0, floor.cols - 1):
                         t = DeskType.BLOCKED
 
                 label = f"D{r+1}{c+1}"  # D11..D46
                 holder = None
                 if t == DeskType.STAFF:
                     holder = f"Holder {label}"  # placeholder, edit in admin
-                desks.append(Desk(row=r, col=c, desk_type=t, label=label, holder_name=holder))
+                desks.append(Desk(floor_id=floor.id, row=r, col=c, desk_type=t, label=label, holder_name=holder))
 
         session.add_all(desks)
         session.commit()
@@ -335,11 +1310,107 @@ def normalize_name(name: str, field_name: str = "name") -> str:
     return n
 
 
+# Not configurable via env: stored hashes don't record the iteration count.
 PWD_KDF_ITERATIONS = 200_000
 
 
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    # Top-level so it can run in a worker process.
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+class PasswordHasher:
+    """
+    Runs PBKDF2 on a dedicated process pool with a bounded queue.
+
+    When max_pending hashes are already queued/running, new requests fail fast
+    with 503 instead of tying up more request threads.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def start(self) -> None:
+        """
+        Creates the pool; lifespan calls this before the server starts its
+        threads. Workers come from a forkserver (spawn where that isn't
+        available), never from fork(): forking a threaded server can copy
+        locks (logging, the DB pool) in a held state into the children.
+        """
+        if self.workers == 0:
+            return
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        if self._executor is None:
+            # Used without lifespan (e.g. scripts): same safe start method.
+            self.start()
+        return self._executor
+
+    def hash(self, password: str, salt: bytes) -> bytes:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+
+        started = time.perf_counter()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return _pbkdf2(password, salt, PWD_KDF_ITERATIONS)
+            return executor.submit(_pbkdf2, password, salt, PWD_KDF_ITERATIONS).result()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+                self._total_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "iterations": PWD_KDF_ITERATIONS,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(1000 * self._total_seconds / self.completed, 1) if self.completed else None,
+                "max_ms": round(1000 * self._max_seconds, 1),
+            }
+
+
+password_hasher = PasswordHasher(PWD_HASH_WORKERS, PWD_HASH_MAX_PENDING)
+
+
 def _hash_password(password: str, salt: bytes) -> bytes:
-    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PWD_KDF_ITERATIONS)
+    return password_hasher.hash(password, salt)
 
 
 def make_password_record(password: str) -> tuple[str, str]:
@@ -360,7 +1431,152 @@ def verify_password(password: str, salt_hex: str, hash_hex: str) -> bool:
     return secrets.compare_digest(got, expected)
 
 
-def require_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> str:
+class TokenCache:
+    """
+    Bounded TTL cache of validated bearer tokens: token -> (username, effective expiry).
+
+    Revocations log themselves with revoke_tokens() and call evict_*() after
+    their commit; sync() applies the ones logged by other workers, and
+    require_user runs it before trusting a cached token whenever
+    sync_seconds have passed. A lookup records the generation before reading
+    the DB and only stores its result if no eviction happened in the
+    meantime, so a revoked token can't be re-cached by a racing read.
+    """
+
+    # When this many log rows are unread, clearing everything is cheaper.
+    SYNC_MAX_ROWS = 5000
+
+    def __init__(self, max_entries: int, ttl_seconds: int, sync_ms: int):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = max(0, ttl_seconds)
+        self.sync_seconds = max(0, sync_ms) / 1000
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, datetime, float]]" = OrderedDict()
+        self._generation = 0
+        self._cursor: Optional[int] = None
+        self._synced_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, token: str, now: datetime) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                username, expires_at, cached_at = entry
+                if expires_at >= now and time.monotonic() - cached_at <= self.ttl_seconds:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return username
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, username: str, expires_at: datetime, generation: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[token] = (username, expires_at, time.monotonic())
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict_token(self, token: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(token, None)
+
+    def evict_users(self, usernames: Iterable[str]) -> None:
+        names = set(usernames)
+        with self._lock:
+            self._generation += 1
+            for t in [t for t, e in self._entries.items() if e[0] in names]:
+                del self._entries[t]
+
+    def purge_expired(self, now: datetime) -> None:
+        with self._lock:
+            for t in [t for t, e in self._entries.items() if e[1] < now]:
+                del self._entries[t]
+
+    def sync_due(self) -> bool:
+        with self._lock:
+            return self._cursor is None or time.monotonic() - self._synced_at >= self.sync_seconds
+
+    def sync(self, session: Session) -> None:
+        """Applies the TokenRevocation rows written (by any worker) since the last call."""
+        with self._lock:
+            cursor = self._cursor
+            self._synced_at = time.monotonic()
+
+        if cursor is not None:
+            oldest = session.exec(select(func.min(TokenRevocation.id))).one()
+            if oldest is None or cursor >= oldest - 1:
+                rows = session.exec(
+                    select(TokenRevocation.id, TokenRevocation.username, TokenRevocation.token)
+                    .where(TokenRevocation.id > cursor)
+                    .order_by(TokenRevocation.id)
+                    .limit(self.SYNC_MAX_ROWS + 1)
+                ).all()
+                if len(rows) <= self.SYNC_MAX_ROWS:
+                    users = {r.username for r in rows if r.token is None}
+                    tokens = {r.token for r in rows if r.token is not None}
+                    if rows:
+                        with self._lock:
+                            self._generation += 1
+                            for t in [t for t, e in self._entries.items() if t in tokens or e[0] in users]:
+                                del self._entries[t]
+                            self._cursor = max(self._cursor or 0, rows[-1].id)
+                    return
+
+        # First call, log compacted past the cursor, or too far behind: start
+        # over from the end of the log.
+        latest = session.exec(select(func.max(TokenRevocation.id))).one() or 0
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._cursor = max(self._cursor or 0, latest)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "cursor": self._cursor,
+            }
+
+
+token_cache = TokenCache(TOKEN_CACHE_MAX, TOKEN_CACHE_TTL_SECONDS, TOKEN_CACHE_SYNC_MS)
+
+
+def get_session():
+    """
+    Request-scoped session, shared by require_user and the endpoint body.
+    Rolled back if the request fails, committed once at the end otherwise
+    (handlers still commit explicitly before post-commit work like cache
+    invalidation).
+    """
+    with Session(engine) as session:
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        else:
+            session.commit()
+
+
+def authenticate(session: Session, credentials: Optional[HTTPAuthorizationCredentials]) -> str:
     if credentials is None or credentials.scheme.lower() != "bearer":
         raise HTTPException(status_code=401, detail="Missing bearer token")
 
@@ -368,101 +1584,287 @@ def require_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)) ->
     if not token:
         raise HTTPException(status_code=401, detail="Missing bearer token")
 
-    with Session(engine) as session:
-        row = session.get(AuthToken, token)
-        if not row:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        now = datetime.utcnow()
+    now = datetime.utcnow()
+    if token_cache.enabled:
+        if token_cache.sync_due():
+            token_cache.sync(session)
+        cached = token_cache.get(token, now)
+        if cached is not None:
+            return cached
+
+    generation = token_cache.generation()
+    row = session.get(AuthToken, token)
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    # Enforce global max TTL even for older tokens.
+    max_expires_at = row.created_at + timedelta(days=TOKEN_TTL_DAYS)
+    effective_expires_at = row.expires_at if row.expires_at <= max_expires_at else max_expires_at
+
+    if effective_expires_at < now:
+        session.delete(row)
+        session.commit()
+        token_cache.evict_token(token)
+        raise HTTPException(status_code=401, detail="Token expired")
 
-        # Enforce global max TTL even for older tokens.
-        max_expires_at = row.created_at + timedelta(days=TOKEN_TTL_DAYS)
-        effective_expires_at = row.expires_at if row.expires_at <= max_expires_at else max_expires_at
+    token_cache.put(token, row.username, effective_expires_at, generation)
+    return row.username
 
-        if effective_expires_at < now:
-            session.delete(row)
-            session.commit()
-            raise HTTPException(status_code=401, detail="Token expired")
-        return row.username
 
+def require_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+    session: Session = Depends(get_session),
+) -> str:
+    return authenticate(session, credentials)
 
-def cleanup_old_data() -> None:
-    """Best-effort cleanup for retention (runs at startup)."""
 
-    today = date.today()
-    bookings_cutoff = today - timedelta(days=BOOKINGS_RETENTION_DAYS)
-    inactive_cutoff = datetime.utcnow() - timedelta(days=INACTIVE_USER_DAYS)
-    now = datetime.utcnow()
+async def get_async_session():
+    """get_session() for DB_ASYNC endpoints."""
+    async with AsyncSession(async_engine) as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        else:
+            await session.commit()
 
-    with Session(engine) as session:
-        # 1) Remove expired tokens
-        expired = session.exec(select(AuthToken).where(AuthToken.expires_at < now)).all()
-        for t in expired:
-            session.delete(t)
-
-        # 2) Remove old bookings
-        old_bookings = session.exec(select(Booking).where(Booking.day < bookings_cutoff)).all()
-        for b in old_bookings:
-            session.delete(b)
-
-        # 3) Remove inactive users (DB-backed users only)
-        # Criteria:
-        # - user.created_at < inactive_cutoff
-        # - no tokens created after cutoff
-        # - no bookings by username after cutoff date
-        users = session.exec(select(User)).all()
-        for u in users:
-            if u.created_at >= inactive_cutoff:
-                continue
 
-            recent_token = session.exec(
-                select(AuthToken)
-                .where(AuthToken.username == u.username, AuthToken.created_at >= inactive_cutoff)
-                .limit(1)
-            ).first()
-            if recent_token:
-                continue
+async def require_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+    session=Depends(get_async_session),
+) -> str:
+    return await session.run_sync(authenticate, credentials)
 
-            # Bookings store a free string; we assume app uses username as booked_by.
-            recent_booking = session.exec(
-                select(Booking)
-                .where(Booking.booked_by == u.username, Booking.day >= inactive_cutoff.date())
-                .limit(1)
-            ).first()
-            if recent_booking:
-                continue
 
-            # Delete user tokens
-            user_tokens = session.exec(select(AuthToken).where(AuthToken.username == u.username)).all()
-            for t in user_tokens:
-                session.delete(t)
+def db_endpoint(fn):
+    """
+    Marks a sync endpoint that can be served on the async engine.
+
+    With DB_ASYNC=1 the endpoint is registered as an `async def` that gets an
+    AsyncSession and runs the unchanged body through AsyncSession.run_sync:
+    every DB round-trip awaits the async driver on the event loop instead of
+    parking a threadpool thread. The body's Python code runs on the event loop
+    too, so endpoints hand their rendering (JSON / packed bodies) to
+    render_off_loop, which keeps only the DB I/O there. Otherwise `fn` is
+    returned as is.
+    """
+    if not DB_ASYNC:
+        return fn
 
-            # Delete all bookings for this username
-            user_bookings = session.exec(select(Booking).where(Booking.booked_by == u.username)).all()
-            for b in user_bookings:
-                session.delete(b)
+    swap = {get_session: get_async_session, require_user: require_user_async}
+    sig = inspect.signature(fn)
+    params = []
+    for p in sig.parameters.values():
+        dep = getattr(p.default, "dependency", None)
+        if dep in swap:
+            annotation = AsyncSession if dep is get_session else p.annotation
+            p = p.replace(default=Depends(swap[dep]), annotation=annotation)
+        params.append(p)
 
-            session.delete(u)
+    @functools.wraps(fn)
+    async def endpoint(**kwargs):
+        session = kwargs.pop("session")
+        return await session.run_sync(lambda s: fn(session=s, **kwargs))
 
-        session.commit()
+    endpoint.__signature__ = sig.replace(parameters=params)
+    return endpoint
 
 
-def delete_user_data(session: Session, username: str) -> dict:
-    """Delete user-linked data (tokens, bookings, user record) for a username."""
+def render_off_loop(render: Callable, *args):
+    """
+    Returns render(*args). Inside a db_endpoint body on the event loop
+    (DB_ASYNC) it runs in a worker thread meanwhile, so serializing a large
+    response doesn't hold up other requests.
+    """
+    if DB_ASYNC and in_greenlet():
+        return await_only(asyncio.to_thread(render, *args))
+    return render(*args)
 
-    deleted_tokens = 0
-    deleted_bookings = 0
-    deleted_user = False
 
-    tokens = session.exec(select(AuthToken).where(AuthToken.username == username)).all()
+def require_user_for_stream(credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> str:
+    """Like require_user, but doesn't keep a session open for a long-lived response."""
+    with Session(engine) as session:
+        return authenticate(session, credentials)
+
+
+# Last retention report (see cleanup_old_data), exposed via /admin/stats.
+last_cleanup_report: Optional[dict] = None
+
+
+def _delete_in_chunks(column, where) -> int:
+    """
+    Deletes rows matching `where` in CLEANUP_CHUNK_SIZE batches, one short
+    transaction per batch. `column` is the table's primary key column.
+    """
+    chunk = max(1, CLEANUP_CHUNK_SIZE)
+    table = column.class_
+    total = 0
+    while True:
+        with Session(engine) as session:
+            ids = select(column).where(where).limit(chunk)
+            n = session.execute(delete(table).where(column.in_(ids))).rowcount or 0
+            session.commit()
+        total += n
+        if n < chunk:
+            return total
+
+
+def cleanup_old_data() -> dict:
+    """
+    Best-effort cleanup for retention (startup + periodic loop).
+
+    Runs as set-based DELETEs in bounded chunks; blocking, so call it off the
+    event loop. Returns rows deleted and time spent per phase.
+    """
+    global last_cleanup_report
+
+    today = date.today()
+    bookings_cutoff = today - timedelta(days=BOOKINGS_RETENTION_DAYS)
+    inactive_cutoff = datetime.utcnow() - timedelta(days=INACTIVE_USER_DAYS)
+    now = datetime.utcnow()
+
+    phases: Dict[str, dict] = {}
+
+    # 1) Remove expired tokens
+    started = time.perf_counter()
+    n = _delete_in_chunks(AuthToken.token, AuthToken.expires_at < now)
+    phases["expired_tokens"] = {"deleted": n, "ms": round(1000 * (time.perf_counter() - started), 1)}
+
+    # 2) Remove old bookings; only the purged days' versions move, so cached
+    #    snapshots of every other day stay valid.
+    started = time.perf_counter()
+    chunk = max(1, CLEANUP_CHUNK_SIZE)
+    n = 0
+    purged_days: Set[date] = set()
+    while True:
+        with Session(engine) as session:
+            rows = session.execute(
+                select(Booking.id, Booking.day).where(Booking.day < bookings_cutoff).limit(chunk)
+            ).all()
+            if rows:
+                session.execute(delete(Booking).where(Booking.id.in_([r[0] for r in rows])))
+                days = {r[1] for r in rows}
+                bump_versions(session, days)
+                session.commit()
+                purged_days |= days
+        n += len(rows)
+        if len(rows) < chunk:
+            break
+    phases["old_bookings"] = {
+        "deleted": n,
+        "days": len(purged_days),
+        "ms": round(1000 * (time.perf_counter() - started), 1),
+    }
+
+    # 3) Remove inactive users (DB-backed users only)
+    # Criteria:
+    # - user.created_at < inactive_cutoff
+    # - no tokens created after cutoff
+    # - no bookings by username after cutoff date
+    # Bookings store a free string; we assume app uses username as booked_by.
+    started = time.perf_counter()
+    inactive = select(User.username).where(
+        User.created_at < inactive_cutoff,
+        ~exists().where(AuthToken.username == User.username, AuthToken.created_at >= inactive_cutoff),
+        ~exists().where(Booking.booked_by == User.username, Booking.day >= inactive_cutoff.date()),
+    ).limit(max(1, CLEANUP_CHUNK_SIZE))
+
+    deleted_users: List[str] = []
+    deleted_tokens = 0
+    deleted_bookings = 0
+    while True:
+        with Session(engine) as session:
+            names = list(session.exec(inactive).all())
+            if not names:
+                break
+            deleted_tokens += session.execute(delete(AuthToken).where(AuthToken.username.in_(names))).rowcount or 0
+            days = set(session.exec(select(Booking.day).where(Booking.booked_by.in_(names)).distinct()).all())
+            deleted_bookings += session.execute(delete(Booking).where(Booking.booked_by.in_(names))).rowcount or 0
+            bump_versions(session, days)
+            purged_days |= days
+            session.execute(delete(ChangeLog).where(ChangeLog.booked_by.in_(names)))
+            session.execute(delete(User).where(User.username.in_(names)))
+            for name in names:
+                revoke_tokens(session, name)
+            session.commit()
+        deleted_users.extend(names)
+    phases["inactive_users"] = {
+        "deleted": len(deleted_users),
+        "deleted_tokens": deleted_tokens,
+        "deleted_bookings": deleted_bookings,
+        "ms": round(1000 * (time.perf_counter() - started), 1),
+    }
+
+    # 4) Compact the change log (always keep the newest row, so GET /changes
+    #    can tell a compacted cursor from an up-to-date one)
+    started = time.perf_counter()
+    changelog_cutoff = now - timedelta(days=CHANGELOG_RETENTION_DAYS)
+    n = _delete_in_chunks(
+        ChangeLog.id,
+        (ChangeLog.created_at < changelog_cutoff)
+        & (ChangeLog.id < select(func.max(ChangeLog.id)).scalar_subquery()),
+    )
+    phases["change_log"] = {"deleted": n, "ms": round(1000 * (time.perf_counter() - started), 1)}
+
+    # 5) Compact the token revocation log the same way; workers read it within
+    #    TOKEN_CACHE_SYNC_MS, and one that fell behind clears its token cache.
+    started = time.perf_counter()
+    n = _delete_in_chunks(
+        TokenRevocation.id,
+        (TokenRevocation.created_at < now - timedelta(hours=1))
+        & (TokenRevocation.id < select(func.max(TokenRevocation.id)).scalar_subquery()),
+    )
+    phases["token_revocations"] = {"deleted": n, "ms": round(1000 * (time.perf_counter() - started), 1)}
+
+    # 6) Refresh planner statistics, now that the tables have their new sizes
+    if PLANNER_STATS_REFRESH:
+        started = time.perf_counter()
+        phases["planner_stats"] = {
+            **refresh_planner_stats(),
+            "ms": round(1000 * (time.perf_counter() - started), 1),
+        }
+
+    token_cache.evict_users(deleted_users)
+    token_cache.purge_expired(now)
+    desk_cache.invalidate_days(purged_days)
+    # Both purges normally only reach past days; should one reach today or
+    # later (a zero retention setting), live clients must refetch.
+    if any(d >= today for d in purged_days):
+        with Session(engine) as session:
+            record_change(session, {"type": "resync"})
+            session.commit()
+        event_hub.notify()
+
+    report = {"finished_at": datetime.utcnow().isoformat() + "Z", "phases": phases}
+    last_cleanup_report = report
+    return report
+
+
+def delete_user_data(session: Session, username: str) -> dict:
+    """
+    Delete user-linked data (tokens, bookings, user record) for a username.
+    Callers must evict the user from token_cache/desk_cache after committing.
+    """
+
+    deleted_tokens = 0
+    deleted_bookings = 0
+    deleted_user = False
+
+    tokens = session.exec(select(AuthToken).where(AuthToken.username == username)).all()
     for t in tokens:
         session.delete(t)
         deleted_tokens += 1
+    revoke_tokens(session, username)
 
     bookings = session.exec(select(Booking).where(Booking.booked_by == username)).all()
     for b in bookings:
         session.delete(b)
         deleted_bookings += 1
 
+    # The change log names bookers too.
+    session.execute(delete(ChangeLog).where(ChangeLog.booked_by == username))
+
     user = session.get(User, username)
     if user:
         session.delete(user)
@@ -524,16 +1926,17 @@ def export_user_data(session: Session, username: str) -> dict:
 
 
 @app.post("/auth/login", response_model=LoginResponse)
-def auth_login(req: LoginRequest):
+def auth_login(req: LoginRequest, session: Session = Depends(get_session)):
     username = normalize_name(req.username, "username")
     password = req.password
 
     # Prefer DB users (supports signup). Fallback to env LAB_USERS for backward compatibility.
     ok = False
-    with Session(engine) as session:
-        user = session.get(User, username)
-        if user:
-            ok = verify_password(password, user.password_salt_hex, user.password_hash_hex)
+    user = session.get(User, username)
+    record = (user.password_salt_hex, user.password_hash_hex) if user else None
+    session.commit()  # don't hold a pooled connection while hashing
+    if record:
+        ok = verify_password(password, *record)
 
     if not ok:
         expected = APP_USERS.get(username)
@@ -546,34 +1949,32 @@ def auth_login(req: LoginRequest):
     expires_at = now + timedelta(days=TOKEN_TTL_DAYS)
     token = secrets.token_urlsafe(32)
 
-    with Session(engine) as session:
-        session.add(AuthToken(token=token, username=username, created_at=now, expires_at=expires_at))
-        session.commit()
+    session.add(AuthToken(token=token, username=username, created_at=now, expires_at=expires_at))
+    session.commit()
 
     return LoginResponse(token=token, username=username, expires_at=expires_at)
 
 
 @app.post("/auth/signup", response_model=LoginResponse)
 @app.post("/auth/register", response_model=LoginResponse)
-def auth_signup(req: LoginRequest):
+def auth_signup(req: LoginRequest, session: Session = Depends(get_session)):
     username = normalize_name(req.username, "username")
     password = req.password
 
     salt_hex, hash_hex = make_password_record(password)
     now = datetime.utcnow()
 
-    with Session(engine) as session:
-        existing = session.get(User, username)
-        if existing:
-            raise HTTPException(status_code=409, detail="User already exists")
+    existing = session.get(User, username)
+    if existing:
+        raise HTTPException(status_code=409, detail="User already exists")
 
-        session.add(User(username=username, password_salt_hex=salt_hex, password_hash_hex=hash_hex, created_at=now))
+    session.add(User(username=username, password_salt_hex=salt_hex, password_hash_hex=hash_hex, created_at=now))
 
-        expires_at = now + timedelta(days=TOKEN_TTL_DAYS)
-        token = secrets.token_urlsafe(32)
-        session.add(AuthToken(token=token, username=username, created_at=now, expires_at=expires_at))
+    expires_at = now + timedelta(days=TOKEN_TTL_DAYS)
+    token = secrets.token_urlsafe(32)
+    session.add(AuthToken(token=token, username=username, created_at=now, expires_at=expires_at))
 
-        session.commit()
+    session.commit()
 
     return LoginResponse(token=token, username=username, expires_at=expires_at)
 
@@ -584,108 +1985,334 @@ def health():
 
 
 @app.post("/auth/logout")
-def auth_logout(username: str = Depends(require_user), credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+def auth_logout(
+    username: str = Depends(require_user),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer),
+    session: Session = Depends(get_session),
+):
     # Revoke current token.
     token = credentials.credentials if credentials else None
     if not token:
         return {"ok": True}
-    with Session(engine) as session:
-        row = session.get(AuthToken, token)
-        if row:
-            session.delete(row)
-            session.commit()
+    row = session.get(AuthToken, token)
+    if row:
+        session.delete(row)
+        revoke_tokens(session, username, token)
+        session.commit()
+    token_cache.evict_token(token)
     return {"ok": True}
 
 
 @app.post("/auth/change-password", response_model=LoginResponse)
-def auth_change_password(req: ChangePasswordRequest, username: str = Depends(require_user)):
+def auth_change_password(
+    req: ChangePasswordRequest,
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
     old_password = req.old_password
     new_password = req.new_password
 
     # Only DB-backed users can change password.
-    with Session(engine) as session:
-        user = session.get(User, username)
-        if not user:
-            raise HTTPException(status_code=400, detail="Password change not available for this user")
-
-        if not verify_password(old_password, user.password_salt_hex, user.password_hash_hex):
-            raise HTTPException(status_code=401, detail="Invalid old password")
-
-        salt_hex, hash_hex = make_password_record(new_password)
-        user.password_salt_hex = salt_hex
-        user.password_hash_hex = hash_hex
-
-        # Revoke all existing tokens for this user and issue a new one.
-        tokens = session.exec(select(AuthToken).where(AuthToken.username == username)).all()
-        for t in tokens:
-            session.delete(t)
-
-        now = datetime.utcnow()
-        expires_at = now + timedelta(days=TOKEN_TTL_DAYS)
-        token = secrets.token_urlsafe(32)
-        session.add(AuthToken(token=token, username=username, created_at=now, expires_at=expires_at))
-        session.add(user)
-        session.commit()
+    user = session.get(User, username)
+    if not user:
+        raise HTTPException(status_code=400, detail="Password change not available for this user")
+    record = (user.password_salt_hex, user.password_hash_hex)
+    session.commit()  # don't hold a pooled connection while hashing
+
+    if not verify_password(old_password, *record):
+        raise HTTPException(status_code=401, detail="Invalid old password")
+
+    salt_hex, hash_hex = make_password_record(new_password)
+    user.password_salt_hex = salt_hex
+    user.password_hash_hex = hash_hex
+
+    # Revoke all existing tokens for this user and issue a new one.
+    tokens = session.exec(select(AuthToken).where(AuthToken.username == username)).all()
+    for t in tokens:
+        session.delete(t)
+    revoke_tokens(session, username)
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=TOKEN_TTL_DAYS)
+    token = secrets.token_urlsafe(32)
+    session.add(AuthToken(token=token, username=username, created_at=now, expires_at=expires_at))
+    session.add(user)
+    session.commit()
+
+    token_cache.evict_users([username])
 
     return LoginResponse(token=token, username=username, expires_at=expires_at)
 
 
 @app.post("/auth/delete-account")
-def auth_delete_account(req: DeleteAccountRequest, username: str = Depends(require_user)):
+def auth_delete_account(
+    req: DeleteAccountRequest,
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
     """Self-service deletion: deletes tokens, bookings and (if present) the DB user."""
 
     password = req.password
 
     # Verify password against DB user if present; otherwise fallback to env users.
-    with Session(engine) as session:
-        user = session.get(User, username)
-        if user:
-            if not verify_password(password, user.password_salt_hex, user.password_hash_hex):
-                raise HTTPException(status_code=401, detail="Invalid password")
-        else:
-            expected = APP_USERS.get(username)
-            if expected is None or not secrets.compare_digest(password, expected):
-                raise HTTPException(status_code=401, detail="Invalid password")
+    user = session.get(User, username)
+    record = (user.password_salt_hex, user.password_hash_hex) if user else None
+    session.commit()  # don't hold a pooled connection while hashing
+    if record:
+        if not verify_password(password, *record):
+            raise HTTPException(status_code=401, detail="Invalid password")
+    else:
+        expected = APP_USERS.get(username)
+        if expected is None or not secrets.compare_digest(password, expected):
+            raise HTTPException(status_code=401, detail="Invalid password")
 
-        deleted = delete_user_data(session, username)
-        session.commit()
-        return {"ok": True, **deleted}
+    deleted = delete_user_data(session, username)
+    bump_versions(session, [GLOBAL_VERSION_DAY])
+    record_change(session, {"type": "resync"})
+    session.commit()
+    token_cache.evict_users([username])
+    desk_cache.invalidate_all()
+    event_hub.notify()
+    return {"ok": True, **deleted}
 
 
 @app.get("/auth/export")
-def auth_export(username: str = Depends(require_user)):
+def auth_export(username: str = Depends(require_user), session: Session = Depends(get_session)):
     """Self-service export of personal data linked to the authenticated user."""
-    with Session(engine) as session:
-        return export_user_data(session, username)
+    return export_user_data(session, username)
+
+
+# DayVersion row bumped by changes that affect all days (desk edits, user deletion).
+GLOBAL_VERSION_DAY = date.min
+
+# Coverages longer than this bump the global version instead of one row per day.
+MAX_VERSIONED_RANGE_DAYS = 366
+
+
+def days_between(start_day: date, end_day: date) -> List[date]:
+    return [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+
+
+def bump_versions(session: Session, days: Iterable[date]) -> None:
+    """
+    Increments DayVersion for the given days (upsert), inside the caller's
+    transaction. Call it before the commit of the write it describes.
+    """
+    keys = sorted(set(days))
+    if not keys:
+        return
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(DayVersion).values([{"day": d, "version": 1} for d in keys])
+    stmt = stmt.on_conflict_do_update(index_elements=["day"], set_={"version": DayVersion.version + 1})
+    session.execute(stmt)
+
+
+def bump_range_versions(session: Session, start_day: date, end_day: date) -> None:
+    if (end_day - start_day).days >= MAX_VERSIONED_RANGE_DAYS:
+        bump_versions(session, [GLOBAL_VERSION_DAY])
+    else:
+        bump_versions(session, days_between(start_day, end_day))
+
+
+# Postgres transaction-level advisory lock taken by ChangeLog/TokenRevocation
+# writers (see _insert_pending_log_rows).
+CHANGELOG_PG_LOCK_KEY = 0x564C5343  # "VLSC"
+
+
+def record_change(session: Session, event: dict) -> dict:
+    """
+    Appends `event` to the change log when the caller's transaction commits
+    (dropped if it rolls back); GET /events picks it up from there (call
+    event_hub.notify() after the commit).
+    """
+    add_log_row(session, ChangeLog(
+        created_at=datetime.utcnow(),
+        kind=event["type"],
+        booked_by=event.get("booked_by"),
+        payload=json.dumps(event),
+    ))
+    return event
+
+
+def revoke_tokens(session: Session, username: str, token: Optional[str] = None) -> None:
+    """
+    Logs the revocation of `token` (all of the user's tokens if None) for the
+    other workers' token caches, when the caller's transaction commits. The
+    caller still evicts them from this worker's token_cache after the commit.
+    """
+    add_log_row(session, TokenRevocation(created_at=datetime.utcnow(), username=username, token=token))
+
+
+def add_log_row(session: Session, row) -> None:
+    """Queues a ChangeLog / TokenRevocation row for _insert_pending_log_rows."""
+    if not session.in_transaction():
+        session.begin()  # so that a rollback is seen (_drop_pending_log_rows)
+    session.info.setdefault("pending_log_rows", []).append(row)
+
+
+@event.listens_for(Session, "before_commit")
+def _insert_pending_log_rows(session: Session) -> None:
+    """
+    Log ids are the readers' cursors (GET /changes, /events, the admin cell
+    cache, the token cache), so no row may become visible after one with a
+    higher id. Ids are therefore taken at commit, by writers that commit one
+    at a time: SQLite only has one writer anyway, and on Postgres the
+    advisory lock is held until this transaction's commit is visible.
+    """
+    rows = session.info.pop("pending_log_rows", None)
+    if not rows:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": CHANGELOG_PG_LOCK_KEY})
+    session.add_all(rows)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_log_rows(session: Session, previous_transaction) -> None:
+    session.info.pop("pending_log_rows", None)
+
+
+def read_day_version(session: Session, day: date) -> Tuple[int, int]:
+    """(global version, day version) with a single primary-key lookup."""
+    rows = session.exec(select(DayVersion).where(DayVersion.day.in_([GLOBAL_VERSION_DAY, day]))).all()
+    versions = {r.day: r.version for r in rows}
+    return versions.get(GLOBAL_VERSION_DAY, 0), versions.get(day, 0)
+
+
+def make_etag(kind: str, day: date, version: Tuple[int, int]) -> str:
+    return f'"{kind}-{day.isoformat()}-{version[0]}-{version[1]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # Tags of compressed bodies carry the encoding (CompressionMiddleware).
+        if candidate == "*" or strip_etag_encoding(candidate) == etag:
+            return True
+    return False
+
+
+def load_active_coverages(
+    session: Session, day: date, desk_ids=None
+) -> Dict[int, StaffCoverage]:
+    """
+    Active coverage per desk for a day, resolved with a single range query.
+    `desk_ids` (a list or an id subquery) limits it to those desks.
+    If multiple exist for a desk (shouldn't due to overlap check), first wins.
+    """
+    q = select(StaffCoverage).where(
+        StaffCoverage.start_day <= day,
+        StaffCoverage.end_day >= day,
+    )
+    if desk_ids is not None:
+        q = q.where(StaffCoverage.desk_id.in_(desk_ids))
+    rows = session.exec(q.order_by(StaffCoverage.desk_id, StaffCoverage.id)).all()
+
+    out: Dict[int, StaffCoverage] = {}
+    for c in rows:
+        out.setdefault(c.desk_id, c)
+    return out
 
 
 def find_active_coverage(
     session: Session, desk_id: int, day: date
 ) -> Optional[StaffCoverage]:
-    return session.exec(
-        select(StaffCoverage).where(
-            StaffCoverage.desk_id == desk_id,
-            StaffCoverage.start_day <= day,
-            StaffCoverage.end_day >= day,
-        )
-    ).first()
+    return load_active_coverages(session, day, [desk_id]).get(desk_id)
 
 
-def check_coverage_overlap(
-    session: Session, desk_id: int, start_day: date, end_day: date, exclude_id: Optional[int] = None
-) -> bool:
+def check_coverage_overlap(session: Session, desk_id: int, start_day: date, end_day: date) -> bool:
     """
     Returns True if there is an overlapping coverage for the desk.
-    Overlap condition: not (new_end < old_start or new_start > old_end)
+
+    One seek on ix_staffcoverage_desk_range: a desk's coverages never overlap
+    (checked by migrations 3 and 6, kept by insert_coverage), so ordered by
+    start_day they are ordered by end_day too, and only the latest one
+    starting on or before `end_day` can reach back to `start_day`.
     """
-    q = select(StaffCoverage).where(StaffCoverage.desk_id == desk_id)
-    rows = session.exec(q).all()
-    for r in rows:
-        if exclude_id is not None and r.id == exclude_id:
-            continue
-        if not (end_day < r.start_day or start_day > r.end_day):
-            return True
-    return False
+    q = select(StaffCoverage.end_day).where(
+        StaffCoverage.desk_id == desk_id,
+        StaffCoverage.start_day <= end_day,
+    )
+    latest_end = session.exec(q.order_by(StaffCoverage.start_day.desc()).limit(1)).first()
+    return latest_end is not None and latest_end >= start_day
+
+
+def insert_coverage(session: Session, cov: StaffCoverage) -> Optional[dict]:
+    """
+    Adds `cov` with its version bumps and change event, unless it overlaps
+    another coverage of the desk: then the transaction is rolled back and None
+    is returned. The caller commits.
+
+    Check and insert are atomic: on SQLite the version bump comes first, so
+    the transaction already holds the database's single write lock when it
+    probes and concurrent inserts run one after the other; on Postgres the
+    ex_staffcoverage_no_overlap exclusion constraint rejects a concurrent
+    overlapping insert.
+    """
+    bump_range_versions(session, cov.start_day, cov.end_day)
+    if check_coverage_overlap(session, cov.desk_id, cov.start_day, cov.end_day):
+        session.rollback()
+        return None
+    session.add(cov)
+    event = record_change(session, coverage_event("coverage_added", cov.desk_id, cov.start_day, cov.end_day))
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        return None
+    return event
+
+
+def check_booking_conflicts(
+    session: Session, items: List[Tuple[int, date, Slot, str]]
+) -> List[Optional[Tuple[str, str]]]:
+    """
+    Validates (desk_id, day, slot, booked_by) items with one desk query and one
+    booking query. Returns, per item, None if bookable or (status, detail).
+
+    Items are resolved in order: an item clashing with an earlier one in the
+    same list is a conflict too.
+    """
+    if not items:
+        return []
+
+    desk_ids = {i[0] for i in items}
+    days = {i[1] for i in items}
+    names = {i[3] for i in items}
+
+    desks = {d.id: d for d in session.exec(select(Desk).where(Desk.id.in_(desk_ids))).all()}
+    existing = session.exec(
+        select(Booking).where(
+            Booking.day.in_(days),
+            or_(Booking.desk_id.in_(desk_ids), Booking.booked_by.in_(names)),
+        )
+    ).all()
+    taken_desk = {(b.desk_id, b.day, b.slot) for b in existing}
+    taken_person = {(b.booked_by, b.day, b.slot) for b in existing}
+
+    out: List[Optional[Tuple[str, str]]] = []
+    for desk_id, day, slot, booked_by in items:
+        desk = desks.get(desk_id)
+        if not desk:
+            out.append(("invalid", "Desk not found."))
+        elif desk.desk_type != DeskType.THESIS:
+            out.append(("invalid", "Desk is not bookable (only 'tesisti')."))
+        elif (desk_id, day, slot) in taken_desk:
+            out.append(("conflict", f"Conflict: desk already booked for {slot.value}."))
+        elif (booked_by, day, slot) in taken_person:
+            out.append(("conflict", f"Conflict: {booked_by} already booked a desk for {slot.value}."))
+        else:
+            taken_desk.add((desk_id, day, slot))
+            taken_person.add((booked_by, day, slot))
+            out.append(None)
+    return out
 
 
 def delete_all_bookings_for_desk(session: Session, desk_id: int) -> int:
@@ -699,123 +2326,1235 @@ def delete_all_bookings_for_desk(session: Session, desk_id: int) -> int:
     return len(rows)
 
 
+def require_floor(session: Session, floor_id: Optional[int]) -> Optional[Floor]:
+    """The floor for a `floor` query parameter (None = all floors); 404 if unknown."""
+    if floor_id is None:
+        return None
+    floor = session.get(Floor, floor_id)
+    if not floor:
+        raise HTTPException(status_code=404, detail="Floor not found.")
+    return floor
+
+
+def make_floor_desks(floor: Floor, desk_type: DeskType) -> List[Desk]:
+    """One desk per cell of a new floor's grid."""
+    desks: List[Desk] = []
+    for r in range(floor.rows):
+        for c in range(floor.cols):
+            label = f"D{r+1}.{c+1}"
+            holder = f"Holder {label}" if desk_type == DeskType.STAFF else None
+            desks.append(Desk(floor_id=floor.id, row=r, col=c, desk_type=desk_type, label=label, holder_name=holder))
+    return desks
+
+
+def select_desks(floor_id: Optional[int] = None):
+    """Desks of one floor (or all of them), in grid order."""
+    q = select(Desk)
+    if floor_id is not None:
+        return q.where(Desk.floor_id == floor_id).order_by(Desk.row, Desk.col)
+    return q.order_by(Desk.floor_id, Desk.row, Desk.col)
+
+
+def floor_desk_ids(floor_id: int):
+    """Subquery for IN (...) filters, so per-floor reads seek by desk_id."""
+    return select(Desk.id).where(Desk.floor_id == floor_id)
+
+
+def build_desk_status_rows(session: Session, day: date, floor_id: Optional[int] = None) -> List[dict]:
+    """
+    Computes the status of all desks (or one floor's desks) for a day:
+    - For THESIS desks: AM/PM bookings for the requested day
+    - For STAFF desks: holder_name + current_occupant for the requested day
+      (current_occupant = temp occupant if holder is away, otherwise holder)
+
+    Rows are plain dicts with the DeskStatusOut fields, in declaration order.
+    """
+    desks = session.exec(select_desks(floor_id)).all()
+    q = select(Booking).where(Booking.day == day)
+    if floor_id is not None:
+        q = q.where(Booking.desk_id.in_(floor_desk_ids(floor_id)))
+    bookings = session.exec(q).all()
+
+    active_cov = load_active_coverages(
+        session, day, floor_desk_ids(floor_id) if floor_id is not None else None
+    )
+
+    booking_idx: Dict[Tuple[int, Slot], str] = {}
+    for b in bookings:
+        booking_idx[(b.desk_id, b.slot)] = b.booked_by
+
+    out: List[dict] = []
+    for d in desks:
+        current_occupant = None
+        cov = None
+        if d.desk_type == DeskType.STAFF:
+            cov = active_cov.get(d.id)
+            current_occupant = cov.temp_occupant if cov else d.holder_name
+        thesis = d.desk_type == DeskType.THESIS
+
+        out.append({
+            "id": d.id,
+            "floor_id": d.floor_id,
+            "row": d.row,
+            "col": d.col,
+            "desk_type": d.desk_type,
+            "label": d.label,
+            "holder_name": d.holder_name,
+            "current_occupant": current_occupant,
+            "holder_away": cov is not None,
+            "away_start": cov.start_day if cov else None,
+            "away_end": cov.end_day if cov else None,
+            "away_temp_occupant": cov.temp_occupant if cov else None,
+            "booking_am": booking_idx.get((d.id, Slot.AM)) if thesis else None,
+            "booking_pm": booking_idx.get((d.id, Slot.PM)) if thesis else None,
+        })
+
+    return out
+
+
+# ----------------------------
+# Desk status cache
+# ----------------------------
+class DeskStatusCache:
+    """
+    LRU of serialized GET /desks bodies, keyed by (day, floor_id); floor_id
+    None is the all-floors view.
+
+    Each snapshot is tagged with the DB DayVersion it was computed at and only
+    served while that version is current, so writes made by other workers are
+    never hidden. Local writers also invalidate (after commit) to free memory
+    early; a reader records the local version before computing and only stores
+    its snapshot if nothing was invalidated in the meantime.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = max(0, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[date, Optional[int]], Tuple[float, Tuple[int, int], bytes]]" = OrderedDict()
+        # Bumped on coarse invalidations (desk metadata, coverage ranges, rollover).
+        self._epoch = 0
+        self._day_versions: Dict[date, int] = {}
+
+    def version(self, day: date) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._day_versions.get(day, 0)
+
+    def get(self, key: Tuple[date, Optional[int]], db_version: Tuple[int, int]) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry[1] != db_version
+                or (self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds)
+            ):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(
+        self, key: Tuple[date, Optional[int]], version: Tuple[int, int], db_version: Tuple[int, int], value: bytes
+    ) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            if (self._epoch, self._day_versions.get(key[0], 0)) != version:
+                return
+            self._entries[key] = (time.monotonic(), db_version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop(self, keep) -> None:
+        for key in [k for k in self._entries if not keep(k[0])]:
+            del self._entries[key]
+
+    def invalidate_days(self, days: Iterable[date]) -> None:
+        with self._lock:
+            days = set(days)
+            for d in days:
+                self._day_versions[d] = self._day_versions.get(d, 0) + 1
+            self._drop(lambda d: d not in days)
+
+    def invalidate_range(self, start_day: date, end_day: date) -> None:
+        # Coverages can span months: drop cached days in range, and bump the
+        # epoch instead of one version per day.
+        with self._lock:
+            self._epoch += 1
+            self._drop(lambda d: not start_day <= d <= end_day)
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def evict_before(self, day: date) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._drop(lambda d: d >= day)
+            self._day_versions = {d: v for d, v in self._day_versions.items() if d >= day}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+desk_cache = DeskStatusCache(DESK_CACHE_MAX_DAYS, DESK_CACHE_TTL_SECONDS)
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller
+    runs `fn`, the others wait for its result (or its exception).
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[object, Future] = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            else:
+                self.shared += 1
+
+        if not leader:
+            if DB_ASYNC and in_greenlet():
+                # Inside AsyncSession.run_sync on the event loop: blocking would
+                # also stall the leader, so await the shared result instead.
+                return await_only(asyncio.wrap_future(flight))
+            return flight.result()
+
+        try:
+            result = fn()
+        except Exception as exc:
+            flight.set_exception(exc)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._flights), "calls": self.calls, "shared": self.shared}
+
+
+desk_flights = SingleFlight()
+
+
+def booking_row(b: Booking) -> dict:
+    """BookingOut as a plain dict, for the FAST_JSON path."""
+    return {"id": b.id, "desk_id": b.desk_id, "day": b.day, "slot": b.slot, "booked_by": b.booked_by}
+
+
+def render_json(content) -> bytes:
+    """Encodes JSON-ready data exactly like FastAPI's JSONResponse."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_desk_statuses(rows: List[dict]) -> bytes:
+    """
+    The JSON FastAPI would send for response_model=List[DeskStatusOut]. With
+    FAST_JSON the rows go straight to orjson, skipping pydantic validation.
+    """
+    if USE_FAST_JSON:
+        return orjson.dumps(rows)
+    return render_json([DeskStatusOut(**row).model_dump(mode="json") for row in rows])
+
+
+def get_desk_statuses_json(
+    session: Session,
+    day: date,
+    db_version: Optional[Tuple[int, int]] = None,
+    floor_id: Optional[int] = None,
+) -> bytes:
+    """
+    Cached, serialized view of build_desk_status_rows(). `db_version` must have
+    been read (read_day_version) before calling, never after.
+
+    Concurrent misses for the same day, floor and version share one
+    computation, so a burst of clients opening the app costs one query set per day.
+    """
+    if db_version is None:
+        db_version = read_day_version(session, day)
+    key = (day, floor_id)
+    cached = desk_cache.get(key, db_version)
+    if cached is not None:
+        return cached
+
+    def compute() -> bytes:
+        version = desk_cache.version(day)
+        body = render_off_loop(render_desk_statuses, build_desk_status_rows(session, day, floor_id))
+        desk_cache.put(key, version, db_version, body)
+        return body
+
+    return desk_flights.do((day, floor_id, db_version), compute)
+
+
+def upcoming_working_days(start: date, count: int) -> List[date]:
+    """start itself plus the next `count` Monday-Friday days."""
+    days = [start]
+    d = start
+    while len(days) < count + 1:
+        d += timedelta(days=1)
+        if d.weekday() < 5:
+            days.append(d)
+    return days
+
+
+def prewarm_desk_cache() -> None:
+    # Warms the all-floors view, which is what the app opens on.
+    if desk_cache.max_entries == 0:
+        return
+    with Session(engine) as session:
+        for d in upcoming_working_days(date.today(), DESK_CACHE_PREWARM_DAYS):
+            get_desk_statuses_json(session, d)
+
+
+# ----------------------------
+# Desk range and packed format
+# ----------------------------
+def load_desk_range(session: Session, start: date, end: date, floor_id: Optional[int] = None):
+    """
+    Desks (all, or one floor's) plus [day][desk] occupancy matrices for
+    start..end, with one bookings query and one coverage query. booking_* hold
+    the booker's name for THESIS desks; coverage holds an index into `spans`
+    for STAFF desks.
+    Returns (days, desks, spans, booking_am, booking_pm, coverage).
+    """
+    span = (end - start).days + 1
+    days = [start + timedelta(days=i) for i in range(span)]
+
+    desks = session.exec(select_desks(floor_id)).all()
+    booking_q = select(Booking).where(Booking.day >= start, Booking.day <= end)
+    coverage_q = select(StaffCoverage).where(StaffCoverage.start_day <= end, StaffCoverage.end_day >= start)
+    if floor_id is not None:
+        booking_q = booking_q.where(Booking.desk_id.in_(floor_desk_ids(floor_id)))
+        coverage_q = coverage_q.where(StaffCoverage.desk_id.in_(floor_desk_ids(floor_id)))
+    bookings = session.exec(booking_q).all()
+    coverages = session.exec(coverage_q.order_by(StaffCoverage.desk_id, StaffCoverage.id)).all()
+
+    desk_pos = {d.id: i for i, d in enumerate(desks)}
+    thesis_ids = {d.id for d in desks if d.desk_type == DeskType.THESIS}
+    staff_ids = {d.id for d in desks if d.desk_type == DeskType.STAFF}
+
+    booking_am: List[List[Optional[str]]] = [[None] * len(desks) for _ in days]
+    booking_pm: List[List[Optional[str]]] = [[None] * len(desks) for _ in days]
+    for b in bookings:
+        if b.desk_id not in thesis_ids:
+            continue
+        matrix = booking_am if b.slot == Slot.AM else booking_pm
+        matrix[(b.day - start).days][desk_pos[b.desk_id]] = b.booked_by
+
+    spans: List[StaffCoverage] = []
+    coverage: List[List[Optional[int]]] = [[None] * len(desks) for _ in days]
+    for c in coverages:
+        if c.desk_id not in staff_ids:
+            continue
+        idx = len(spans)
+        spans.append(c)
+        col = desk_pos[c.desk_id]
+        for i in range((max(c.start_day, start) - start).days, (min(c.end_day, end) - start).days + 1):
+            # if multiple exist (shouldn't due to overlap check), first wins
+            if coverage[i][col] is None:
+                coverage[i][col] = idx
+
+    return days, desks, spans, booking_am, booking_pm, coverage
+
+
+# Packed binary form of the desk views (content-negotiated, JSON stays default).
+PACKED_MEDIA_TYPE = "application/msgpack"
+PACKED_ACCEPT = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+
+
+def wants_packed(request: Request) -> bool:
+    return not PACKED_ACCEPT.isdisjoint(accepted_values(request.headers.get("accept") or ""))
+
+
+def _msgpack_write(out: bytearray, obj) -> None:
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80 or -0x20 <= obj < 0:
+            out += struct.pack(">b" if obj < 0 else ">B", obj)
+        elif 0 < obj <= 0xFF:
+            out += struct.pack(">BB", 0xCC, obj)
+        elif 0 < obj <= 0xFFFF:
+            out += struct.pack(">BH", 0xCD, obj)
+        elif 0 < obj <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, obj)
+        elif obj > 0:
+            out += struct.pack(">BQ", 0xCF, obj)
+        elif obj >= -0x80:
+            out += struct.pack(">Bb", 0xD0, obj)
+        elif obj >= -0x8000:
+            out += struct.pack(">Bh", 0xD1, obj)
+        elif obj >= -0x80000000:
+            out += struct.pack(">Bi", 0xD2, obj)
+        else:
+            out += struct.pack(">Bq", 0xD3, obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xA0 | n)
+        elif n <= 0xFF:
+            out += struct.pack(">BB", 0xD9, n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDA, n)
+        else:
+            out += struct.pack(">BI", 0xDB, n)
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDC, n)
+        else:
+            out += struct.pack(">BI", 0xDD, n)
+        for item in obj:
+            _msgpack_write(out, item)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDE, n)
+        else:
+            out += struct.pack(">BI", 0xDF, n)
+        for key, value in obj.items():
+            _msgpack_write(out, key)
+            _msgpack_write(out, value)
+    else:
+        raise TypeError(f"Can't pack {type(obj).__name__}")
+
+
+def msgpack_dumps(obj) -> bytes:
+    """MessagePack encoding of nil/bool/int/str/list/dict data; enough for the packed views."""
+    out = bytearray()
+    _msgpack_write(out, obj)
+    return bytes(out)
+
+
+def pack_desk_range(
+    start: date,
+    end: date,
+    desks: List[Desk],
+    spans: List[StaffCoverage],
+    booking_am: List[List[Optional[str]]],
+    booking_pm: List[List[Optional[str]]],
+    coverage: List[List[Optional[int]]],
+) -> bytes:
+    """
+    MessagePack map with the same content as DeskRangeOut, laid out by column:
+    - every string (labels, holders, bookers, temp occupants) is sent once in
+      `names`, and referenced everywhere else by its index;
+    - desk metadata is one array per field (`id`, `floor`, `row`, `col`,
+      `type`, `label`, `holder`), `type` indexing into `types`;
+    - `am`, `pm` and `coverage` are [day][desk] matrices of name / `coverages`
+      indexes (nil = empty), for the consecutive days start..end;
+    - `coverages` holds [start_day, end_day, temp_occupant] spans.
+    A single day's GET /desks uses the same layout with start == end.
+    """
+    names: List[str] = []
+    name_idx: Dict[str, int] = {}
+
+    def intern(name: Optional[str]) -> Optional[int]:
+        if name is None:
+            return None
+        idx = name_idx.get(name)
+        if idx is None:
+            idx = name_idx[name] = len(names)
+            names.append(name)
+        return idx
+
+    types = list(DeskType)
+    type_idx = {t: i for i, t in enumerate(types)}
+    return msgpack_dumps({
+        "v": 1,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "types": [t.value for t in types],
+        "id": [d.id for d in desks],
+        "floor": [d.floor_id for d in desks],
+        "row": [d.row for d in desks],
+        "col": [d.col for d in desks],
+        "type": [type_idx[d.desk_type] for d in desks],
+        "label": [intern(d.label) for d in desks],
+        "holder": [intern(d.holder_name) for d in desks],
+        "coverages": [[c.start_day.isoformat(), c.end_day.isoformat(), intern(c.temp_occupant)] for c in spans],
+        "am": [[intern(n) for n in row] for row in booking_am],
+        "pm": [[intern(n) for n in row] for row in booking_pm],
+        "coverage": coverage,
+        "names": names,
+    })
+
+
+# ----------------------------
+# Change events (SSE)
+# ----------------------------
+class EventHub:
+    """
+    Fans out small change events to GET /events subscribers, per day.
+
+    Every event is a ChangeLog row, so each worker's hub tails the log (like
+    AdminCellCache.sync) and subscribers see writes made by any worker. run()
+    polls every EVENTS_POLL_MS; notify() is thread-safe and lets a handler
+    that just committed wake it right away. Subscribers live on the asyncio
+    loop (one bounded queue each). A subscriber whose queue is full loses its
+    backlog and gets one "resync" event instead, so a slow client never holds
+    memory or blocks writers; so does everyone when the log was compacted
+    past the hub's cursor or it fell more than TAIL_MAX_ROWS behind.
+    """
+
+    TAIL_MAX_ROWS = 1000
+
+    def __init__(self, queue_size: int, max_subscribers: int, poll_ms: int):
+        self.queue_size = max(1, queue_size)
+        self.max_subscribers = max(0, max_subscribers)
+        self.poll_seconds = max(10, poll_ms) / 1000
+        self.published = 0
+        self.overflows = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._subs: Dict[date, Set[asyncio.Queue]] = {}
+        self._count = 0
+        # Only touched by run() and the _tail() it awaits.
+        self._cursor: Optional[int] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._wake = asyncio.Event()
+
+    def subscribe(self, day: date) -> asyncio.Queue:
+        if self._count >= self.max_subscribers:
+            raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "30"})
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.setdefault(day, set()).add(q)
+        self._count += 1
+        return q
+
+    def unsubscribe(self, day: date, q: asyncio.Queue) -> None:
+        subs = self._subs.get(day)
+        if subs is not None and q in subs:
+            subs.discard(q)
+            self._count -= 1
+            if not subs:
+                del self._subs[day]
+
+    def notify(self) -> None:
+        """Call after committing a ChangeLog row: tails the log now instead of at the next poll."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self) -> None:
+        """Tails the ChangeLog for the lifetime of the app (a lifespan task)."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                events = await asyncio.to_thread(self._tail)
+            except Exception:
+                # Followers may start before the leader has created the schema.
+                continue
+            for event in events:
+                self._dispatch(event, *event_days(event))
+
+    def _tail(self) -> List[dict]:
+        """The events logged since the last call, oldest first."""
+        with Session(engine) as session:
+            if self._cursor is not None:
+                oldest = session.exec(select(func.min(ChangeLog.id))).one()
+                if oldest is None or self._cursor >= oldest - 1:
+                    rows = session.exec(
+                        select(ChangeLog.id, ChangeLog.payload)
+                        .where(ChangeLog.id > self._cursor)
+                        .order_by(ChangeLog.id)
+                        .limit(self.TAIL_MAX_ROWS + 1)
+                    ).all()
+                    if len(rows) <= self.TAIL_MAX_ROWS:
+                        if rows:
+                            self._cursor = rows[-1].id
+                        return [json.loads(row.payload) for row in rows]
+
+            # First call, log compacted past the cursor, or too far behind:
+            # start over from the end of the log.
+            latest = session.exec(select(func.max(ChangeLog.id))).one() or 0
+
+        lost = self._cursor is not None
+        self._cursor = max(self._cursor or 0, latest)
+        return [{"type": "resync"}] if lost else []
+
+    def _dispatch(self, event: dict, start_day: Optional[date], end_day: Optional[date]) -> None:
+        self.published += 1
+        for day, subs in self._subs.items():
+            if start_day is not None and not (start_day <= day <= end_day):
+                continue
+            for q in subs:
+                try:
+                    q.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.overflows += 1
+                    while not q.empty():
+                        q.get_nowait()
+                    q.put_nowait({"type": "resync"})
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "days": len(self._subs),
+            "published": self.published,
+            "overflows": self.overflows,
+            "cursor": self._cursor,
+        }
+
+
+def event_days(event: dict) -> Tuple[Optional[date], Optional[date]]:
+    """Days an event affects, as (start_day, end_day); (None, None) = every day."""
+    if "day" in event:
+        day = date.fromisoformat(event["day"])
+        return day, day
+    if "start_day" in event:
+        return date.fromisoformat(event["start_day"]), date.fromisoformat(event["end_day"])
+    return None, None
+
+
+event_hub = EventHub(EVENTS_QUEUE_SIZE, EVENTS_MAX_SUBSCRIBERS, EVENTS_POLL_MS)
+
+
+def booking_event(kind: str, b: Booking) -> dict:
+    return {
+        "type": kind,
+        "id": b.id,
+        "day": b.day.isoformat(),
+        "desk_id": b.desk_id,
+        "slot": b.slot.value if isinstance(b.slot, Slot) else b.slot,
+        "booked_by": b.booked_by,
+    }
+
+
+def coverage_event(kind: str, desk_id: int, start_day: date, end_day: date) -> dict:
+    return {
+        "type": kind,
+        "desk_id": desk_id,
+        "start_day": start_day.isoformat(),
+        "end_day": end_day.isoformat(),
+    }
+
+
+def desk_event(desk: Desk, bookings_cleared: bool) -> dict:
+    return {
+        "type": "desk_updated",
+        "desk_id": desk.id,
+        "desk_type": desk.desk_type.value,
+        "label": desk.label,
+        "holder_name": desk.holder_name,
+        "bookings_cleared": bookings_cleared,
+    }
+
+
+# ----------------------------
+# Booking write queue (group commit)
+# ----------------------------
+def booking_conflict_detail(session: Session, desk_id: int, day: date, slot: Slot, booked_by: str) -> Optional[str]:
+    """Why `booked_by` can't book (desk_id, day, slot), or None if it's free."""
+    desk_conflict = session.exec(
+        select(Booking).where(
+            Booking.desk_id == desk_id,
+            Booking.day == day,
+            Booking.slot == slot,
+        )
+    ).first()
+    if desk_conflict:
+        return f"Conflict: desk already booked for {slot}."
+
+    person_conflict = session.exec(
+        select(Booking).where(
+            Booking.booked_by == booked_by,
+            Booking.day == day,
+            Booking.slot == slot,
+        )
+    ).first()
+    if person_conflict:
+        return f"Conflict: {booked_by} already booked a desk for {slot}."
+
+    return None
+
+
+def queued_create_booking(
+    session: Session, events: List[Tuple[dict, date]], req: BookingCreate, booked_by: str
+) -> List[BookingOut]:
+    """
+    POST /bookings inside a group-commit batch. Conflicts are checked against
+    the batch's own pending writes too, so earlier requests win. As on the
+    direct path, an AM booking is kept when the PM half conflicts.
+    """
+    desk = session.get(Desk, req.desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
+    if desk.desk_type != DeskType.THESIS:
+        raise HTTPException(status_code=400, detail="Desk is not bookable (only 'tesisti').")
+
+    created: List[BookingOut] = []
+    for slot, enabled in [(Slot.AM, req.am), (Slot.PM, req.pm)]:
+        if not enabled:
+            continue
+        detail = booking_conflict_detail(session, req.desk_id, req.day, slot, booked_by)
+        if detail:
+            raise HTTPException(status_code=409, detail=detail)
+
+        b = Booking(desk_id=req.desk_id, day=req.day, slot=slot, booked_by=booked_by)
+        session.add(b)
+        session.flush()
+        events.append((record_change(session, booking_event("booking_created", b)), b.day))
+        created.append(BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by))
+    return created
+
+
+def queued_delete_booking(session: Session, events: List[Tuple[dict, date]], booking_id: int, username: str) -> dict:
+    """DELETE /bookings/{id} inside a group-commit batch."""
+    b = session.get(Booking, booking_id)
+    if not b:
+        raise HTTPException(status_code=404, detail="Booking not found.")
+    if b.booked_by != username:
+        raise HTTPException(status_code=403, detail="Not allowed to delete this booking.")
+
+    events.append((record_change(session, booking_event("booking_cancelled", b)), b.day))
+    session.delete(b)
+    session.flush()
+    return {"ok": True}
+
+
+class BookingWriteQueue:
+    """
+    Group commit for single booking writes.
+
+    Request threads submit an operation and block on its Future. One writer
+    thread takes the first waiting operation, collects whatever else arrives
+    within `window_ms`, then runs them in arrival order in one transaction,
+    with one version bump and one commit (one fsync / one trip through the
+    SQLite writer lock). Each operation still raises its own HTTPException,
+    which only fails that caller. If the commit itself fails (e.g. another
+    worker took a slot first) the batch is replayed one operation per
+    transaction, so a single request can't sink the others.
+
+    Not used with DB_ASYNC=1: waiting on the Future would block the event loop.
+    """
+
+    def __init__(self, window_ms: int, max_batch: int):
+        self.window_ms = max(0, window_ms)
+        self.max_batch = max(1, max_batch)
+        self.batches = 0
+        self.writes = 0
+        self.largest_batch = 0
+        self.replays = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[object, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and not DB_ASYNC
+
+    def submit(self, op):
+        """Runs `op(session, events)` in the next batch and returns its result (or raises its error)."""
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="booking-writes", daemon=True)
+                self._thread.start()
+        self._queue.put((op, future))
+        return future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.window_ms / 1000
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            try:
+                self._apply(batch)
+            except Exception as exc:
+                for _op, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _commit_batch(self, batch: list) -> Tuple[list, List[Tuple[dict, date]]]:
+        outcomes: list = []
+        events: List[Tuple[dict, date]] = []
+        with Session(engine, expire_on_commit=False) as session:
+            for op, _future in batch:
+                try:
+                    outcomes.append((op(session, events), None))
+                except HTTPException as exc:
+                    outcomes.append((None, exc))
+            if events:
+                bump_versions(session, {day for _event, day in events})
+            session.commit()
+        return outcomes, events
+
+    def _apply(self, batch: list, retry: bool = True) -> None:
+        try:
+            outcomes, events = self._commit_batch(batch)
+        except Exception as exc:
+            with self._lock:
+                self.replays += 1
+            if len(batch) > 1:
+                for item in batch:
+                    self._apply([item])
+            elif retry:
+                # Re-running sees the row that beat us and answers with the proper 409.
+                self._apply(batch, retry=False)
+            else:
+                err = exc if isinstance(exc, HTTPException) else HTTPException(status_code=500, detail="Booking error.")
+                batch[0][1].set_exception(err)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+        if events:
+            desk_cache.invalidate_days({day for _event, day in events})
+            event_hub.notify()
+        for (_op, future), (result, exc) in zip(batch, outcomes):
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "window_ms": self.window_ms,
+                "batches": self.batches,
+                "writes": self.writes,
+                "avg_batch": round(self.writes / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch,
+                "replays": self.replays,
+            }
+
+
+booking_writes = BookingWriteQueue(BOOKING_GROUP_COMMIT_MS, BOOKING_GROUP_COMMIT_MAX)
+
+
 # ----------------------------
 # User endpoints (Bearer token)
 # ----------------------------
+@app.get("/events")
+async def events(
+    request: Request,
+    day: date = Query(..., description="YYYY-MM-DD"),
+    username: str = Depends(require_user_for_stream),
+):
+    """
+    Server-Sent Events stream of changes affecting `day`:
+    booking_created / booking_cancelled, desk_updated, coverage_added / coverage_removed,
+    and "resync" when the client should refetch GET /desks.
+    """
+    _ = username  # auth guard; not used otherwise
+    q = event_hub.subscribe(day)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(q.get(), timeout=max(1, EVENTS_KEEPALIVE_SECONDS))
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_hub.unsubscribe(day, q)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/changes", response_model=ChangesOut)
+@db_endpoint
+def get_changes(
+    since: int = Query(0, ge=0, description="Cursor from the previous call (0 = from the start)"),
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Delta sync: booking, desk and coverage mutations after `since`, oldest first.
+    If `reset` is true the log no longer reaches back to `since` (compacted):
+    refetch cached days with GET /desks and continue from the returned cursor.
+    """
+    _ = username  # auth guard; not used otherwise
+    page = max(1, CHANGES_PAGE_SIZE)
+
+    oldest = session.exec(select(func.min(ChangeLog.id))).one()
+    reset = oldest is not None and since < oldest - 1
+
+    # Ids become visible in order (see _insert_pending_log_rows), so nothing
+    # can show up behind a cursor that was already handed out.
+    rows = session.exec(select(ChangeLog).where(ChangeLog.id > since).order_by(ChangeLog.id).limit(page + 1)).all()
+
+    has_more = len(rows) > page
+    rows = rows[:page]
+    return ChangesOut(
+        cursor=rows[-1].id if rows else since,
+        has_more=has_more,
+        reset=reset,
+        changes=[ChangeOut(id=r.id, created_at=r.created_at, type=r.kind, data=json.loads(r.payload)) for r in rows],
+    )
+
+
 @app.get("/desks", response_model=List[DeskStatusOut])
-def get_desks(day: date = Query(..., description="YYYY-MM-DD"), username: str = Depends(require_user)):
+@db_endpoint
+def get_desks(
+    request: Request,
+    day: date = Query(..., description="YYYY-MM-DD"),
+    floor: Optional[int] = Query(None, description="Floor id (GET /floors); all floors if omitted"),
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
     """
-    Returns all desks with:
+    Returns all desks (or one floor's desks) with:
     - For THESIS desks: AM/PM bookings for the requested day
     - For STAFF desks: holder_name + current_occupant for the requested day
       (current_occupant = temp occupant if holder is away, otherwise holder)
-    """
-    with Session(engine) as session:
-        desks = session.exec(select(Desk).order_by(Desk.row, Desk.col)).all()
-        bookings = session.exec(select(Booking).where(Booking.day == day)).all()
-
-        booking_idx: Dict[Tuple[int, Slot], str] = {}
-        for b in bookings:
-            booking_idx[(b.desk_id, b.slot)] = b.booked_by
 
-        out: List[DeskStatusOut] = []
-        for d in desks:
-            status = DeskStatusOut(
+    Supports conditional GET: answers 304 when If-None-Match has the current ETag.
+    Send `Accept: application/msgpack` for the packed binary form (see pack_desk_range).
+    """
+    _ = username  # auth guard; not used otherwise
+    require_floor(session, floor)
+    packed = wants_packed(request)
+    version = read_day_version(session, day)
+    kind = "desks-packed" if packed else "desks"
+    if floor is not None:
+        kind += f"-floor{floor}"
+    etag = make_etag(kind, day, version)
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if packed:
+        _days, desks, spans, booking_am, booking_pm, coverage = load_desk_range(session, day, day, floor)
+        body = render_off_loop(pack_desk_range, day, day, desks, spans, booking_am, booking_pm, coverage)
+        return Response(content=body, media_type=PACKED_MEDIA_TYPE, headers=headers)
+    body = get_desk_statuses_json(session, day, version, floor)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/desks/range", response_model=DeskRangeOut)
+@db_endpoint
+def get_desks_range(
+    request: Request,
+    response: Response,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD (inclusive)"),
+    floor: Optional[int] = Query(None, description="Floor id (GET /floors); all floors if omitted"),
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Multi-day view: desk metadata once, plus a day x desk occupancy matrix.
+    Uses one bookings query and one coverage query for the whole range.
+    Send `Accept: application/msgpack` for the packed binary form.
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must be >= start.")
+    span = (end - start).days + 1
+    if span > DESK_RANGE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range too long (max {DESK_RANGE_MAX_DAYS} days).")
+
+    _ = username  # auth guard; not used otherwise
+    require_floor(session, floor)
+    days, desks, spans, booking_am, booking_pm, coverage = load_desk_range(session, start, end, floor)
+    if wants_packed(request):
+        body = render_off_loop(pack_desk_range, start, end, desks, spans, booking_am, booking_pm, coverage)
+        return Response(content=body, media_type=PACKED_MEDIA_TYPE, headers={"Vary": "Accept"})
+
+    response.headers["Vary"] = "Accept"
+    return DeskRangeOut(
+        start=start,
+        end=end,
+        days=days,
+        desks=[
+            DeskInfoOut(
                 id=d.id,
+                floor_id=d.floor_id,
                 row=d.row,
                 col=d.col,
                 desk_type=d.desk_type,
                 label=d.label,
                 holder_name=d.holder_name,
             )
+            for d in desks
+        ],
+        coverages=[CoverageSpanOut(start_day=c.start_day, end_day=c.end_day, temp_occupant=c.temp_occupant) for c in spans],
+        booking_am=booking_am,
+        booking_pm=booking_pm,
+        coverage=coverage,
+    )
 
-            if d.desk_type == DeskType.THESIS:
-                status.booking_am = booking_idx.get((d.id, Slot.AM))
-                status.booking_pm = booking_idx.get((d.id, Slot.PM))
-
-            elif d.desk_type == DeskType.STAFF:
-                cov = find_active_coverage(session, d.id, day)
-                if cov:
-                    status.holder_away = True
-                    status.away_start = cov.start_day
-                    status.away_end = cov.end_day
-                    status.away_temp_occupant = cov.temp_occupant
-                    status.current_occupant = cov.temp_occupant
-                else:
-                    status.current_occupant = d.holder_name
-
-            out.append(status)
 
-        _ = username  # auth guard; not used otherwise
-        return out
+@app.get("/floors", response_model=List[FloorOut])
+def list_floors(username: str = Depends(require_user), session: Session = Depends(get_session)):
+    """Floors / rooms with their grid size and desk count; pass `id` as `floor` to GET /desks."""
+    _ = username  # auth guard; not used otherwise
+    counts = dict(session.exec(select(Desk.floor_id, func.count()).group_by(Desk.floor_id)).all())
+    floors = session.exec(select(Floor).order_by(Floor.id)).all()
+    return [FloorOut(id=f.id, name=f.name, rows=f.rows, cols=f.cols, desks=counts.get(f.id, 0)) for f in floors]
 
 
 @app.get("/bookings", response_model=List[BookingOut])
-def list_bookings(day: date = Query(...), username: str = Depends(require_user)):
-    with Session(engine) as session:
-        rows = session.exec(
-            select(Booking).where(Booking.day == day).order_by(Booking.slot, Booking.desk_id)
-        ).all()
-        _ = username  # auth guard; not used otherwise
-        return [BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by) for b in rows]
+@db_endpoint
+def list_bookings(
+    request: Request,
+    response: Response,
+    day: date = Query(...),
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
+    # Same conditional GET scheme as /desks.
+    etag = make_etag("bookings", day, read_day_version(session, day))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    rows = session.exec(
+        select(Booking).where(Booking.day == day).order_by(Booking.slot, Booking.desk_id)
+    ).all()
+    _ = username  # auth guard; not used otherwise
+    if USE_FAST_JSON:
+        body = orjson.dumps([booking_row(b) for b in rows])
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    return [BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by) for b in rows]
+
+
+@app.get("/bookings/mine", response_model=MyBookingsOut)
+@db_endpoint
+def list_my_bookings(
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD (inclusive)"),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Bookings of the authenticated user in [start, end], ordered by (day, slot).
+    Served by the (booked_by, day, slot) unique index, with keyset pagination.
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must be >= start.")
+
+    q = select(Booking).where(Booking.booked_by == username, Booking.day >= start, Booking.day <= end)
+    if after:
+        try:
+            after_day_s, after_slot_s = after.split(":", 1)
+            after_day, after_slot = date.fromisoformat(after_day_s), Slot(after_slot_s)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        q = q.where(or_(Booking.day > after_day, (Booking.day == after_day) & (Booking.slot > after_slot)))
+
+    rows = session.exec(q.order_by(Booking.day, Booking.slot).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = f"{last.day.isoformat()}:{last.slot.value}"
+
+    if USE_FAST_JSON:
+        body = orjson.dumps({"bookings": [booking_row(b) for b in rows], "next_cursor": next_cursor})
+        return Response(content=body, media_type="application/json")
+    return MyBookingsOut(
+        bookings=[BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by) for b in rows],
+        next_cursor=next_cursor,
+    )
 
 
 @app.post("/bookings", response_model=List[BookingOut])
-def create_booking(req: BookingCreate, username: str = Depends(require_user)):
+@db_endpoint
+def create_booking(
+    req: BookingCreate,
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
     # Tie bookings to the authenticated user to prevent spoofing.
     booked_by = username
 
     if not req.am and not req.pm:
         raise HTTPException(status_code=400, detail="Select at least AM or PM.")
 
-    with Session(engine) as session:
-        desk = session.get(Desk, req.desk_id)
-        if not desk:
-            raise HTTPException(status_code=404, detail="Desk not found.")
-        if desk.desk_type != DeskType.THESIS:
-            raise HTTPException(status_code=400, detail="Desk is not bookable (only 'tesisti').")
+    if booking_writes.enabled:
+        session.commit()  # hand the pooled connection back while waiting for the batch
+        return booking_writes.submit(lambda s, events: queued_create_booking(s, events, req, booked_by))
+
+    desk = session.get(Desk, req.desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
+    if desk.desk_type != DeskType.THESIS:
+        raise HTTPException(status_code=400, detail="Desk is not bookable (only 'tesisti').")
+
+    created: List[Booking] = []
+    for slot, enabled in [(Slot.AM, req.am), (Slot.PM, req.pm)]:
+        if not enabled:
+            continue
+
+        b = Booking(desk_id=req.desk_id, day=req.day, slot=slot, booked_by=booked_by)
+        session.add(b)
+        try:
+            bump_versions(session, [req.day])  # also flushes `b`, assigning its id
+            record_change(session, booking_event("booking_created", b))
+            session.commit()
+            desk_cache.invalidate_days([req.day])
+            session.refresh(b)
+            created.append(b)
+            event_hub.notify()
+        except Exception:
+            session.rollback()
+
+            detail = booking_conflict_detail(session, req.desk_id, req.day, slot, booked_by)
+            if detail:
+                raise HTTPException(status_code=409, detail=detail)
+
+            raise HTTPException(status_code=500, detail="Booking error.")
+
+    return [BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by) for b in created]
 
-        created: List[Booking] = []
-        for slot, enabled in [(Slot.AM, req.am), (Slot.PM, req.pm)]:
-            if not enabled:
-                continue
 
-            b = Booking(desk_id=req.desk_id, day=req.day, slot=slot, booked_by=booked_by)
-            session.add(b)
+@app.post("/bookings/batch", response_model=BookingBatchOut)
+@db_endpoint
+def create_bookings_batch(
+    req: BookingBatchCreate,
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
+    """
+    Books many (desk_id, day, slot) items at once, e.g. a whole week.
+    Conflicts are checked in one query and all bookable items are inserted in
+    a single transaction; the response has one result per item, in order.
+    """
+    items = [(i.desk_id, i.day, i.slot, username) for i in req.items]
+
+    # A concurrent booking can still win a slot between check and commit;
+    # re-check once before giving up.
+    for _attempt in range(2):
+        errors = check_booking_conflicts(session, items)
+        apply = not (req.all_or_nothing and any(e is not None for e in errors))
+
+        rows: Dict[int, BookingOut] = {}
+        if apply:
+            added: Dict[int, Booking] = {}
+            for idx, (desk_id, day, slot, booked_by) in enumerate(items):
+                if errors[idx] is None:
+                    added[idx] = Booking(desk_id=desk_id, day=day, slot=slot, booked_by=booked_by)
+            session.add_all(added.values())
             try:
+                bump_versions(session, {b.day for b in added.values()})
+                for b in added.values():
+                    record_change(session, booking_event("booking_created", b))
+                # The shared session expires rows on commit; snapshot them first.
+                rows = {
+                    idx: BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by)
+                    for idx, b in added.items()
+                }
                 session.commit()
-                session.refresh(b)
-                created.append(b)
-            except Exception:
+            except IntegrityError:
                 session.rollback()
+                continue
 
-                desk_conflict = session.exec(
-                    select(Booking).where(
-                        Booking.desk_id == req.desk_id,
-                        Booking.day == req.day,
-                        Booking.slot == slot,
-                    )
-                ).first()
-                if desk_conflict:
-                    raise HTTPException(status_code=409, detail=f"Conflict: desk already booked for {slot}.")
-
-                person_conflict = session.exec(
-                    select(Booking).where(
-                        Booking.booked_by == booked_by,
-                        Booking.day == req.day,
-                        Booking.slot == slot,
-                    )
-                ).first()
-                if person_conflict:
-                    raise HTTPException(status_code=409, detail=f"Conflict: {booked_by} already booked a desk for {slot}.")
+        if rows:
+            desk_cache.invalidate_days({b.day for b in rows.values()})
+            event_hub.notify()
+
+        results: List[BookingBatchResult] = []
+        for idx, item in enumerate(req.items):
+            b = rows.get(idx)
+            if b is not None:
+                results.append(BookingBatchResult(
+                    desk_id=item.desk_id, day=item.day, slot=item.slot, status="created",
+                    booking=b,
+                ))
+            elif errors[idx] is not None:
+                status, detail = errors[idx]
+                results.append(BookingBatchResult(
+                    desk_id=item.desk_id, day=item.day, slot=item.slot, status=status, detail=detail,
+                ))
+            else:
+                results.append(BookingBatchResult(
+                    desk_id=item.desk_id, day=item.day, slot=item.slot, status="skipped",
+                    detail="Not booked: another item in the batch failed.",
+                ))
 
-                raise HTTPException(status_code=500, detail="Booking error.")
+        return BookingBatchOut(ok=len(rows) == len(items), created=len(rows), results=results)
 
-        return [BookingOut(id=b.id, desk_id=b.desk_id, day=b.day, slot=b.slot, booked_by=b.booked_by) for b in created]
+    raise HTTPException(status_code=409, detail="Conflict: slots changed concurrently, please retry.")
 
 
 @app.delete("/bookings/{booking_id}")
-def delete_booking(booking_id: int, req: CancelRequest, username: str = Depends(require_user)):
+@db_endpoint
+def delete_booking(
+    booking_id: int,
+    req: CancelRequest,
+    username: str = Depends(require_user),
+    session: Session = Depends(get_session),
+):
     """
     Deletes a booking owned by the authenticated user.
     """
@@ -823,352 +3562,748 @@ def delete_booking(booking_id: int, req: CancelRequest, username: str = Depends(
     if (req.booked_by or "").strip() and req.booked_by.strip() != username:
         raise HTTPException(status_code=403, detail="Name does not match authenticated user")
 
-    with Session(engine) as session:
-        b = session.get(Booking, booking_id)
-        if not b:
-            raise HTTPException(status_code=404, detail="Booking not found.")
-        if b.booked_by != username:
-            raise HTTPException(status_code=403, detail="Not allowed to delete this booking.")
-
-        session.delete(b)
-        session.commit()
-        return {"ok": True}
+    if booking_writes.enabled:
+        session.commit()  # hand the pooled connection back while waiting for the batch
+        return booking_writes.submit(lambda s, events: queued_delete_booking(s, events, booking_id, username))
+
+    b = session.get(Booking, booking_id)
+    if not b:
+        raise HTTPException(status_code=404, detail="Booking not found.")
+    if b.booked_by != username:
+        raise HTTPException(status_code=403, detail="Not allowed to delete this booking.")
+
+    day = b.day
+    record_change(session, booking_event("booking_cancelled", b))
+    session.delete(b)
+    bump_versions(session, [day])
+    session.commit()
+    desk_cache.invalidate_days([day])
+    event_hub.notify()
+    return {"ok": True}
 
 
 # ----------------------------
 # Admin API endpoints (Basic Auth)
 # ----------------------------
 @app.delete("/admin/users/{username}", dependencies=[Depends(require_admin)])
-def admin_delete_user(username: str):
+def admin_delete_user(username: str, session: Session = Depends(get_session)):
     """Admin deletion: deletes tokens, bookings and DB user record for a username."""
 
     u = normalize_name(username, "username")
-    with Session(engine) as session:
-        deleted = delete_user_data(session, u)
-        session.commit()
-        return {"ok": True, **deleted}
+    deleted = delete_user_data(session, u)
+    bump_versions(session, [GLOBAL_VERSION_DAY])
+    record_change(session, {"type": "resync"})
+    session.commit()
+    token_cache.evict_users([u])
+    desk_cache.invalidate_all()
+    event_hub.notify()
+    return {"ok": True, **deleted}
+
+
+@app.get("/admin/stats", dependencies=[Depends(require_admin)])
+def admin_stats():
+    """In-process cache counters (per worker), for sizing."""
+    return {
+        "pid": os.getpid(),
+        "leader": leader.is_leader,
+        "database": database_settings,
+        "schema": schema_report,
+        "token_cache": token_cache.stats(),
+        "desk_cache": desk_cache.stats(),
+        "desk_flights": desk_flights.stats(),
+        "admin_cells": admin_cells.stats(),
+        "password_hashing": password_hasher.stats(),
+        "events": event_hub.stats(),
+        "booking_writes": booking_writes.stats(),
+        "compression": compression_stats.stats(),
+        "last_cleanup": last_cleanup_report,
+    }
+
+
+@app.post("/floors", response_model=FloorOut, dependencies=[Depends(require_admin)])
+def create_floor(req: FloorCreate, session: Session = Depends(get_session)):
+    """Adds a floor / room and fills its rows x cols grid with desks of `desk_type`."""
+    name = req.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Floor name is required.")
+    if session.exec(select(Floor.id).where(Floor.name == name)).first() is not None:
+        raise HTTPException(status_code=409, detail="A floor with this name already exists.")
+
+    floor = Floor(name=name, rows=req.rows, cols=req.cols)
+    session.add(floor)
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail="A floor with this name already exists.")
+    session.add_all(make_floor_desks(floor, req.desk_type))
+
+    # New desks show up on every day.
+    bump_versions(session, [GLOBAL_VERSION_DAY])
+    record_change(session, {"type": "resync"})
+    session.commit()
+    desk_cache.invalidate_all()
+    event_hub.notify()
+    return FloorOut(id=floor.id, name=floor.name, rows=floor.rows, cols=floor.cols, desks=floor.rows * floor.cols)
 
 
 @app.patch("/desks/{desk_id}", response_model=DeskStatusOut, dependencies=[Depends(require_admin)])
-def update_desk(desk_id: int, req: DeskUpdate, day: date = Query(..., description="YYYY-MM-DD")):
+def update_desk(
+    desk_id: int,
+    req: DeskUpdate,
+    day: date = Query(..., description="YYYY-MM-DD"),
+    session: Session = Depends(get_session),
+):
     """
     Admin update for desk_type/label/holder_name.
 
     IMPORTANT: If a desk changes from THESIS to STAFF/BLOCKED,
     all existing bookings for that desk are automatically deleted.
     """
-    with Session(engine) as session:
-        desk = session.get(Desk, desk_id)
-        if not desk:
-            raise HTTPException(status_code=404, detail="Desk not found.")
-
-        old_type = desk.desk_type
-
-        desk.desk_type = req.desk_type
-        if req.label is not None:
-            desk.label = req.label
-
-        # Only meaningful for STAFF desks; we still allow storing it, but you can ignore it elsewhere.
-        if req.holder_name is not None:
-            desk.holder_name = req.holder_name.strip() or None
-
-        # If desk stops being THESIS => delete all bookings for that desk
-        deleted_count = 0
-        if old_type == DeskType.THESIS and req.desk_type != DeskType.THESIS:
-            deleted_count = delete_all_bookings_for_desk(session, desk_id)
-
-        # If desk becomes STAFF, ensure it has some holder (optional)
-        if desk.desk_type == DeskType.STAFF and (desk.holder_name is None or desk.holder_name.strip() == ""):
-            desk.holder_name = f"Holder {desk.label}"
-
-        session.add(desk)
-        session.commit()
-        session.refresh(desk)
-
-        # Return status for requested day
-        status = DeskStatusOut(
-            id=desk.id,
-            row=desk.row,
-            col=desk.col,
-            desk_type=desk.desk_type,
-            label=desk.label,
-            holder_name=desk.holder_name,
-        )
+    desk = session.get(Desk, desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
+
+    old_type = desk.desk_type
+
+    desk.desk_type = req.desk_type
+    if req.label is not None:
+        desk.label = req.label
+
+    # Only meaningful for STAFF desks; we still allow storing it, but you can ignore it elsewhere.
+    if req.holder_name is not None:
+        desk.holder_name = req.holder_name.strip() or None
+
+    # If desk stops being THESIS => delete all bookings for that desk
+    deleted_count = 0
+    if old_type == DeskType.THESIS and req.desk_type != DeskType.THESIS:
+        deleted_count = delete_all_bookings_for_desk(session, desk_id)
+
+    # If desk becomes STAFF, ensure it has some holder (optional)
+    if desk.desk_type == DeskType.STAFF and (desk.holder_name is None or desk.holder_name.strip() == ""):
+        desk.holder_name = f"Holder {desk.label}"
+
+    session.add(desk)
+    bump_versions(session, [GLOBAL_VERSION_DAY])
+    record_change(session, desk_event(desk, deleted_count > 0))
+    session.commit()
+    desk_cache.invalidate_all()
+    session.refresh(desk)
+    event_hub.notify()
+
+    # Return status for requested day
+    status = DeskStatusOut(
+        id=desk.id,
+        floor_id=desk.floor_id,
+        row=desk.row,
+        col=desk.col,
+        desk_type=desk.desk_type,
+        label=desk.label,
+        holder_name=desk.holder_name,
+    )
 
-        if desk.desk_type == DeskType.THESIS:
-            bookings = session.exec(select(Booking).where(Booking.day == day, Booking.desk_id == desk_id)).all()
-            status.booking_am = next((b.booked_by for b in bookings if b.slot == Slot.AM), None)
-            status.booking_pm = next((b.booked_by for b in bookings if b.slot == Slot.PM), None)
-
-        elif desk.desk_type == DeskType.STAFF:
-            cov = find_active_coverage(session, desk_id, day)
-            if cov:
-                status.holder_away = True
-                status.away_start = cov.start_day
-                status.away_end = cov.end_day
-                status.away_temp_occupant = cov.temp_occupant
-                status.current_occupant = cov.temp_occupant
-            else:
-                status.current_occupant = desk.holder_name
+    if desk.desk_type == DeskType.THESIS:
+        bookings = session.exec(select(Booking).where(Booking.day == day, Booking.desk_id == desk_id)).all()
+        status.booking_am = next((b.booked_by for b in bookings if b.slot == Slot.AM), None)
+        status.booking_pm = next((b.booked_by for b in bookings if b.slot == Slot.PM), None)
+
+    elif desk.desk_type == DeskType.STAFF:
+        cov = find_active_coverage(session, desk_id, day)
+        if cov:
+            status.holder_away = True
+            status.away_start = cov.start_day
+            status.away_end = cov.end_day
+            status.away_temp_occupant = cov.temp_occupant
+            status.current_occupant = cov.temp_occupant
+        else:
+            status.current_occupant = desk.holder_name
 
-        # You can inspect deleted_count in logs if needed; keeping response clean.
-        # (If you want it in the response, we can add a field.)
-        _ = deleted_count
-        return status
+    # You can inspect deleted_count in logs if needed; keeping response clean.
+    # (If you want it in the response, we can add a field.)
+    _ = deleted_count
+    return status
 
 
 @app.get("/coverages", response_model=List[CoverageOut], dependencies=[Depends(require_admin)])
-def list_coverages(desk_id: Optional[int] = Query(None)):
-    with Session(engine) as session:
-        q = select(StaffCoverage).order_by(StaffCoverage.desk_id, StaffCoverage.start_day)
-        if desk_id is not None:
-            q = q.where(StaffCoverage.desk_id == desk_id)
-        rows = session.exec(q).all()
-        return [
-            CoverageOut(
-                id=c.id,
-                desk_id=c.desk_id,
-                start_day=c.start_day,
-                end_day=c.end_day,
-                temp_occupant=c.temp_occupant,
-                note=c.note,
-            )
-            for c in rows
-        ]
+def list_coverages(desk_id: Optional[int] = Query(None), session: Session = Depends(get_session)):
+    q = select(StaffCoverage).order_by(StaffCoverage.desk_id, StaffCoverage.start_day)
+    if desk_id is not None:
+        q = q.where(StaffCoverage.desk_id == desk_id)
+    rows = session.exec(q).all()
+    return [
+        CoverageOut(
+            id=c.id,
+            desk_id=c.desk_id,
+            start_day=c.start_day,
+            end_day=c.end_day,
+            temp_occupant=c.temp_occupant,
+            note=c.note,
+        )
+        for c in rows
+    ]
 
 
 @app.post("/coverages", response_model=CoverageOut, dependencies=[Depends(require_admin)])
-def create_coverage(req: CoverageCreate):
+def create_coverage(req: CoverageCreate, session: Session = Depends(get_session)):
     temp_occupant = normalize_name(req.temp_occupant, "temp_occupant")
 
     if req.end_day < req.start_day:
         raise HTTPException(status_code=400, detail="end_day must be >= start_day.")
 
-    with Session(engine) as session:
-        desk = session.get(Desk, req.desk_id)
-        if not desk:
-            raise HTTPException(status_code=404, detail="Desk not found.")
-        if desk.desk_type != DeskType.STAFF:
-            raise HTTPException(status_code=400, detail="Coverage can only be set for STAFF desks.")
-
-        if check_coverage_overlap(session, req.desk_id, req.start_day, req.end_day):
-            raise HTTPException(status_code=409, detail="Coverage overlaps with an existing one for this desk.")
-
-        cov = StaffCoverage(
-            desk_id=req.desk_id,
-            start_day=req.start_day,
-            end_day=req.end_day,
-            temp_occupant=temp_occupant,
-            note=req.note or "",
-        )
-        session.add(cov)
-        session.commit()
-        session.refresh(cov)
-
-        return CoverageOut(
-            id=cov.id,
-            desk_id=cov.desk_id,
-            start_day=cov.start_day,
-            end_day=cov.end_day,
-            temp_occupant=cov.temp_occupant,
-            note=cov.note,
-        )
+    desk = session.get(Desk, req.desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
+    if desk.desk_type != DeskType.STAFF:
+        raise HTTPException(status_code=400, detail="Coverage can only be set for STAFF desks.")
+
+    cov = StaffCoverage(
+        desk_id=req.desk_id,
+        start_day=req.start_day,
+        end_day=req.end_day,
+        temp_occupant=temp_occupant,
+        note=req.note or "",
+    )
+    event = insert_coverage(session, cov)
+    if event is None:
+        raise HTTPException(status_code=409, detail="Coverage overlaps with an existing one for this desk.")
+    session.commit()
+    desk_cache.invalidate_range(cov.start_day, cov.end_day)
+    session.refresh(cov)
+    event_hub.notify()
+
+    return CoverageOut(
+        id=cov.id,
+        desk_id=cov.desk_id,
+        start_day=cov.start_day,
+        end_day=cov.end_day,
+        temp_occupant=cov.temp_occupant,
+        note=cov.note,
+    )
 
 
 @app.delete("/coverages/{coverage_id}", dependencies=[Depends(require_admin)])
-def delete_coverage(coverage_id: int):
-    with Session(engine) as session:
-        cov = session.get(StaffCoverage, coverage_id)
-        if not cov:
-            raise HTTPException(status_code=404, detail="Coverage not found.")
-        session.delete(cov)
-        session.commit()
-        return {"ok": True}
+def delete_coverage(coverage_id: int, session: Session = Depends(get_session)):
+    cov = session.get(StaffCoverage, coverage_id)
+    if not cov:
+        raise HTTPException(status_code=404, detail="Coverage not found.")
+    start_day, end_day = cov.start_day, cov.end_day
+    record_change(session, coverage_event("coverage_removed", cov.desk_id, start_day, end_day))
+    session.delete(cov)
+    bump_range_versions(session, start_day, end_day)
+    session.commit()
+    desk_cache.invalidate_range(start_day, end_day)
+    event_hub.notify()
+    return {"ok": True}
 
 
 @app.post("/coverages/clear", dependencies=[Depends(require_admin)])
-def clear_coverages(desk_id: int = Query(...)):
+def clear_coverages(desk_id: int = Query(...), session: Session = Depends(get_session)):
     """Delete all coverages for a given desk."""
-    with Session(engine) as session:
-        rows = session.exec(select(StaffCoverage).where(StaffCoverage.desk_id == desk_id)).all()
-        for r in rows:
-            session.delete(r)
-        session.commit()
-        return {"ok": True, "deleted": len(rows)}
+    rows = session.exec(select(StaffCoverage).where(StaffCoverage.desk_id == desk_id)).all()
+    ranges = [(r.start_day, r.end_day) for r in rows]
+    for s, e in ranges:
+        record_change(session, coverage_event("coverage_removed", desk_id, s, e))
+    for r in rows:
+        session.delete(r)
+        bump_range_versions(session, r.start_day, r.end_day)
+    session.commit()
+    if ranges:
+        desk_cache.invalidate_range(min(s for s, _ in ranges), max(e for _, e in ranges))
+        event_hub.notify()
+    return {"ok": True, "deleted": len(rows)}
 
 
 # ----------------------------
 # Admin Web UI (Basic Auth)
 # ----------------------------
-@app.get("/admin/desks", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
-def admin_desks(day: date = Query(..., description="YYYY-MM-DD")):
-    """
-    Admin grid page:
-    - Change desk type + label
-    - Edit holder_name for STAFF desks
-    - Set vacation coverage (start/end + temp occupant)
-    - Shows AM/PM bookings for THESIS desks
-    - Shows current occupant / away badge for STAFF desks
-    """
-    with Session(engine) as session:
-        desks = session.exec(select(Desk).order_by(Desk.row, Desk.col)).all()
-        bookings = session.exec(select(Booking).where(Booking.day == day)).all()
-        coverages = session.exec(select(StaffCoverage)).all()
+class Markup(str):
+    """HTML that is already escaped; HtmlTemplate inserts it as is."""
 
-    booking_idx = {(b.desk_id, b.slot): b.booked_by for b in bookings}
 
-    # Active coverage per desk for the selected day (if any)
-    active_cov: Dict[int, StaffCoverage] = {}
-    for c in coverages:
-        if c.start_day <= day <= c.end_day:
-            # if multiple exist (shouldn't due to overlap check), first wins
-            active_cov.setdefault(c.desk_id, c)
-
-    grid = [[None for _ in range(6)] for _ in range(4)]
-    for d in desks:
-        grid[d.row][d.col] = d
-
-    def option(selected: bool, value: str, text: str) -> str:
-        return f'<option value="{value}"{" selected" if selected else ""}>{text}</option>'
-
-    rows_html = ""
-    for r in range(4):
-        rows_html += "<tr>"
-        for c in range(6):
-            d = grid[r][c]
-            if d is None:
-                rows_html += "<td style='padding:8px;border:1px solid #ddd;'>N/A</td>"
-                continue
-
-            # THESIS booking badges
-            am = booking_idx.get((d.id, Slot.AM))
-            pm = booking_idx.get((d.id, Slot.PM))
-            thesis_badges = ""
-            if am:
-                thesis_badges += f"<div style='margin-top:6px;font-size:12px;'>🟦 AM: {am}</div>"
-            if pm:
-                thesis_badges += f"<div style='margin-top:2px;font-size:12px;'>🟪 PM: {pm}</div>"
-
-            # STAFF occupancy info
-            staff_info = ""
-            if d.desk_type == DeskType.STAFF:
-                cov = active_cov.get(d.id)
-                if cov:
-                    staff_info = (
-                        f"<div style='margin-top:6px;font-size:12px;'>🏖 Holder away "
-                        f"({cov.start_day.isoformat()} → {cov.end_day.isoformat()})</div>"
-                        f"<div style='margin-top:2px;font-size:12px;'>👤 Temp occupant: {cov.temp_occupant}</div>"
-                    )
-                else:
-                    staff_info = (
-                        f"<div style='margin-top:6px;font-size:12px;'>👤 Current occupant: {d.holder_name or '—'}</div>"
-                    )
-
-            # Desk editor form
-            holder_input = ""
-            if d.desk_type == DeskType.STAFF:
-                holder_val = (d.holder_name or "").replace('"', "&quot;")
-                holder_input = (
-                    "<div style='margin-top:6px'>"
-                    f"<input name='holder_name' value=\"{holder_val}\" placeholder='Holder name' style='width:140px'/>"
-                    "</div>"
-                )
-            else:
-                holder_input = "<input type='hidden' name='holder_name' value=''/>"
-
-            label_val = (d.label or "").replace('"', "&quot;")
-
-            editor_form = (
-                f"<form method='post' action='/admin/desks/{d.id}?day={day.isoformat()}'>"
-                f"<div style='font-weight:600'>{d.label} (id {d.id})</div>"
-                f"<div style='font-size:12px;color:#444'>r{d.row+1} c{d.col+1}</div>"
-                f"<div style='margin-top:6px'>"
-                f"<select name='desk_type'>"
-                f"{option(d.desk_type == DeskType.STAFF, 'staff', 'staff')}"
-                f"{option(d.desk_type == DeskType.THESIS, 'tesisti', 'tesisti')}"
-                f"{option(d.desk_type == DeskType.BLOCKED, 'bloccata', 'bloccata')}"
-                f"</select>"
-                f"</div>"
-                f"<div style='margin-top:6px'>"
-                f"<input name='label' value=\"{label_val}\" style='width:100px'/>"
-                f"</div>"
-                f"{holder_input}"
-                f"<button style='margin-top:6px'>Save</button>"
-                f"</form>"
-            )
-
-            # Coverage form for STAFF
-            coverage_form = ""
-            if d.desk_type == DeskType.STAFF:
-                coverage_form = (
-                    f"<hr style='margin:10px 0'/>"
-                    f"<div style='font-size:12px;font-weight:600;'>Set vacation/coverage</div>"
-                    f"<form method='post' action='/admin/coverages?day={day.isoformat()}'>"
-                    f"<input type='hidden' name='desk_id' value='{d.id}'/>"
-                    f"<div style='margin-top:6px;font-size:12px;'>Start</div>"
-                    f"<input name='start_day' value='{day.isoformat()}' style='width:140px'/>"
-                    f"<div style='margin-top:6px;font-size:12px;'>End</div>"
-                    f"<input name='end_day' value='{day.isoformat()}' style='width:140px'/>"
-                    f"<div style='margin-top:6px;font-size:12px;'>Temp occupant</div>"
-                    f"<input name='temp_occupant' value='' placeholder='Name' style='width:140px'/>"
-                    f"<div style='margin-top:6px;font-size:12px;'>Note</div>"
-                    f"<input name='note' value='' placeholder='Optional' style='width:140px'/>"
-                    f"<button style='margin-top:8px'>Add</button>"
-                    f"</form>"
-                    f"<form method='post' action='/admin/coverages/clear?desk_id={d.id}&day={day.isoformat()}'>"
-                    f"<button style='margin-top:6px'>Clear all coverages</button>"
-                    f"</form>"
-                )
+class HtmlTemplate:
+    """
+    A str.format-style template, split into literal text and fields once at
+    import time. render() HTML-escapes every value that isn't Markup.
+    """
 
-            # Compose cell
-            cell = editor_form
-            if d.desk_type == DeskType.THESIS:
-                cell += thesis_badges
-            if d.desk_type == DeskType.STAFF:
-                cell += staff_info + coverage_form
+    def __init__(self, source: str):
+        self._parts = [(literal, field) for literal, field, _spec, _conv in string.Formatter().parse(source)]
 
-            rows_html += f"<td style='vertical-align:top;padding:8px;border:1px solid #ddd'>{cell}</td>"
+    def render(self, **values) -> Markup:
+        out: List[str] = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                value = values[field]
+                out.append(value if isinstance(value, Markup) else html.escape(str(value)))
+        return Markup("".join(out))
 
-        rows_html += "</tr>"
 
-    html = f"""
+ADMIN_PAGE_HEAD = HtmlTemplate("""
     <html>
       <head>
         <meta charset="utf-8"/>
         <title>Admin — Desks</title>
       </head>
       <body style="font-family: Arial, sans-serif; padding: 16px;">
-        <h2>Admin — Desks (day: {day.isoformat()})</h2>
+        <h2>Admin — Desks (day: {day})</h2>
+
+        <div style="margin-bottom:12px;">Floor: {floor_links}</div>
 
         <div style="margin-bottom:12px;">
           Change day:
           <form method="get" action="/admin/desks" style="display:inline;">
-            <input name="day" value="{day.isoformat()}" />
+            <input name="day" value="{day}" />
+            {floor_input}
             <button>Go</button>
           </form>
         </div>
 
-        <table style="border-collapse:collapse;">
-          {rows_html}
+        <table id="desk-grid" style="border-collapse:collapse;">
+""")
+
+ADMIN_PAGE_TAIL = Markup("""
         </table>
 
+        <script>
+          // Post the grid's forms in the background and swap in the cell the
+          // server sends back, instead of reloading the page (without JS the
+          // forms still post and redirect back here).
+          document.getElementById("desk-grid").addEventListener("submit", async (ev) => {
+            const form = ev.target;
+            ev.preventDefault();
+            const cell = form.closest("td");
+            const res = await fetch(form.action, {
+              method: "POST",
+              body: new URLSearchParams(new FormData(form)),
+              headers: {"X-Admin-Fragment": "1"},
+            });
+            if (res.ok) {
+              cell.outerHTML = await res.text();
+              return;
+            }
+            let detail = res.statusText;
+            try { detail = (await res.json()).detail; } catch (e) {}
+            alert(typeof detail === "string" ? detail : JSON.stringify(detail));
+          });
+        </script>
+
         <p style="margin-top:14px;color:#555;font-size:12px;">
           Admin area protected by HTTP Basic.
           Tip: set LAB_ADMIN_USER / LAB_ADMIN_PASS environment variables.
         </p>
       </body>
     </html>
+""")
+
+ADMIN_FLOOR_LINK = HtmlTemplate("<a href='/admin/desks?{query}'>{name}</a>")
+ADMIN_FLOOR_CURRENT = HtmlTemplate("<b>{name}</b>")
+ADMIN_FLOOR_INPUT = HtmlTemplate('<input type="hidden" name="floor" value="{floor}" />')
+
+ADMIN_EMPTY_CELL = Markup("<td style='padding:8px;border:1px solid #ddd;'>N/A</td>")
+
+ADMIN_CELL = HtmlTemplate(
+    "<td id='desk-{id}' style='vertical-align:top;padding:8px;border:1px solid #ddd'>"
+    "<form method='post' action='/admin/desks/{id}?{query}'>"
+    "<div style='font-weight:600'>{label} (id {id})</div>"
+    "<div style='font-size:12px;color:#444'>r{row} c{col}</div>"
+    "<div style='margin-top:6px'>{type_select}</div>"
+    "<div style='margin-top:6px'>"
+    "<input name='label' value=\"{label}\" style='width:100px'/>"
+    "</div>"
+    "{holder_input}"
+    "<button style='margin-top:6px'>Save</button>"
+    "</form>"
+    "{details}"
+    "</td>"
+)
+
+# The desk type <select>, one per selected type.
+ADMIN_TYPE_SELECT: Dict[DeskType, Markup] = {
+    selected: Markup(
+        "<select name='desk_type'>"
+        + "".join(
+            f'<option value="{t.value}"{" selected" if t == selected else ""}>{t.value}</option>' for t in DeskType
+        )
+        + "</select>"
+    )
+    for selected in DeskType
+}
+
+ADMIN_HOLDER_INPUT = HtmlTemplate(
+    "<div style='margin-top:6px'>"
+    "<input name='holder_name' value=\"{holder}\" placeholder='Holder name' style='width:140px'/>"
+    "</div>"
+)
+ADMIN_HOLDER_HIDDEN = Markup("<input type='hidden' name='holder_name' value=''/>")
+
+ADMIN_BOOKING_AM = HtmlTemplate("<div style='margin-top:6px;font-size:12px;'>🟦 AM: {name}</div>")
+ADMIN_BOOKING_PM = HtmlTemplate("<div style='margin-top:2px;font-size:12px;'>🟪 PM: {name}</div>")
+
+ADMIN_STAFF_AWAY = HtmlTemplate(
+    "<div style='margin-top:6px;font-size:12px;'>🏖 Holder away ({start} → {end})</div>"
+    "<div style='margin-top:2px;font-size:12px;'>👤 Temp occupant: {temp}</div>"
+)
+ADMIN_STAFF_PRESENT = HtmlTemplate("<div style='margin-top:6px;font-size:12px;'>👤 Current occupant: {holder}</div>")
+
+ADMIN_COVERAGE_FORMS = HtmlTemplate(
+    "<hr style='margin:10px 0'/>"
+    "<div style='font-size:12px;font-weight:600;'>Set vacation/coverage</div>"
+    "<form method='post' action='/admin/coverages?{query}'>"
+    "<input type='hidden' name='desk_id' value='{id}'/>"
+    "<div style='margin-top:6px;font-size:12px;'>Start</div>"
+    "<input name='start_day' value='{day}' style='width:140px'/>"
+    "<div style='margin-top:6px;font-size:12px;'>End</div>"
+    "<input name='end_day' value='{day}' style='width:140px'/>"
+    "<div style='margin-top:6px;font-size:12px;'>Temp occupant</div>"
+    "<input name='temp_occupant' value='' placeholder='Name' style='width:140px'/>"
+    "<div style='margin-top:6px;font-size:12px;'>Note</div>"
+    "<input name='note' value='' placeholder='Optional' style='width:140px'/>"
+    "<button style='margin-top:8px'>Add</button>"
+    "</form>"
+    "<form method='post' action='/admin/coverages/clear?desk_id={id}&amp;{query}'>"
+    "<button style='margin-top:6px'>Clear all coverages</button>"
+    "</form>"
+)
+
+
+def admin_query(day: date, floor: Optional[int]) -> str:
+    query = f"day={day.isoformat()}"
+    return query if floor is None else f"{query}&floor={floor}"
+
+
+def admin_desks_url(day: date, floor: Optional[int]) -> str:
+    return "/admin/desks?" + admin_query(day, floor)
+
+
+def render_admin_cell(
+    desk,
+    day: date,
+    query: str,
+    booking_am: Optional[str],
+    booking_pm: Optional[str],
+    coverage: Optional[Tuple[date, date, str]],
+) -> Markup:
+    """
+    One desk's <td> on the admin grid: the desk editor, plus the AM/PM
+    bookings (THESIS) or the occupant and coverage forms (STAFF).
+    `coverage` is the active (start_day, end_day, temp_occupant), if any.
+    """
+    details = ""
+    if desk.desk_type == DeskType.THESIS:
+        if booking_am:
+            details += ADMIN_BOOKING_AM.render(name=booking_am)
+        if booking_pm:
+            details += ADMIN_BOOKING_PM.render(name=booking_pm)
+    elif desk.desk_type == DeskType.STAFF:
+        if coverage:
+            start, end, temp = coverage
+            details += ADMIN_STAFF_AWAY.render(start=start.isoformat(), end=end.isoformat(), temp=temp)
+        else:
+            details += ADMIN_STAFF_PRESENT.render(holder=desk.holder_name or "—")
+        details += ADMIN_COVERAGE_FORMS.render(id=desk.id, day=day.isoformat(), query=query)
+
+    if desk.desk_type == DeskType.STAFF:
+        holder_input = ADMIN_HOLDER_INPUT.render(holder=desk.holder_name or "")
+    else:
+        holder_input = ADMIN_HOLDER_HIDDEN
+
+    return ADMIN_CELL.render(
+        id=desk.id,
+        query=query,
+        label=desk.label or "",
+        row=desk.row + 1,
+        col=desk.col + 1,
+        type_select=ADMIN_TYPE_SELECT[desk.desk_type],
+        holder_input=holder_input,
+        details=Markup(details),
+    )
+
+
+class AdminCellCache:
+    """
+    Rendered /admin/desks cells, keyed by (desk_id, day), LRU.
+
+    A cell only depends on its desk and on that desk's bookings and coverages,
+    and every change to those goes to the ChangeLog with its desk_id. sync()
+    reads the log past its cursor before each page and drops the cells of the
+    desks named there (all cells on "resync"), so writes from any worker
+    invalidate exactly the cells they touched. A renderer records
+    version(desk_id) before reading and only stores its cell if the desk
+    wasn't invalidated in the meantime.
+    """
+
+    # When this many log rows are unread, clearing everything is cheaper.
+    SYNC_MAX_ROWS = 5000
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, date], Markup]" = OrderedDict()
+        self._days: Dict[int, Set[date]] = {}
+        self._epoch = 0
+        self._desk_versions: Dict[int, int] = {}
+        self._cursor: Optional[int] = None
+
+    def version(self, desk_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._desk_versions.get(desk_id, 0)
+
+    def get(self, desk_id: int, day: date) -> Optional[Markup]:
+        with self._lock:
+            cell = self._entries.get((desk_id, day))
+            if cell is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((desk_id, day))
+            self.hits += 1
+            return cell
+
+    def put(self, desk_id: int, day: date, version: Tuple[int, int], cell: Markup) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            if (self._epoch, self._desk_versions.get(desk_id, 0)) != version:
+                return
+            self._entries[(desk_id, day)] = cell
+            self._entries.move_to_end((desk_id, day))
+            self._days.setdefault(desk_id, set()).add(day)
+            while len(self._entries) > self.max_entries:
+                (old_desk, old_day), _ = self._entries.popitem(last=False)
+                days = self._days[old_desk]
+                days.discard(old_day)
+                if not days:
+                    del self._days[old_desk]
+
+    def invalidate_desks(self, desk_ids: Iterable[int]) -> None:
+        with self._lock:
+            for desk_id in desk_ids:
+                self._desk_versions[desk_id] = self._desk_versions.get(desk_id, 0) + 1
+                for d in self._days.pop(desk_id, ()):
+                    del self._entries[(desk_id, d)]
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._days.clear()
+            self._desk_versions.clear()
+
+    def sync(self, session: Session) -> None:
+        """Applies the ChangeLog rows written (by any worker) since the last call."""
+        with self._lock:
+            cursor = self._cursor
+
+        if cursor is not None:
+            oldest = session.exec(select(func.min(ChangeLog.id))).one()
+            if oldest is None or cursor >= oldest - 1:
+                rows = session.exec(
+                    select(ChangeLog.id, ChangeLog.kind, ChangeLog.payload)
+                    .where(ChangeLog.id > cursor)
+                    .order_by(ChangeLog.id)
+                    .limit(self.SYNC_MAX_ROWS + 1)
+                ).all()
+                if len(rows) <= self.SYNC_MAX_ROWS:
+                    self._apply(rows, cursor)
+                    return
+
+        # First call, log compacted past the cursor, or too far behind: start
+        # over from the end of the log.
+        latest = session.exec(select(func.max(ChangeLog.id))).one() or 0
+        self.invalidate_all()
+        with self._lock:
+            self._cursor = max(self._cursor or 0, latest)
+
+    def _apply(self, rows, cursor: int) -> None:
+        desk_ids: Set[int] = set()
+        everything = False
+        for row in rows:
+            if row.kind == "resync":
+                everything = True
+            else:
+                desk_id = json.loads(row.payload).get("desk_id")
+                if desk_id is not None:
+                    desk_ids.add(desk_id)
+            cursor = row.id
+
+        if everything:
+            self.invalidate_all()
+        elif desk_ids:
+            self.invalidate_desks(desk_ids)
+        with self._lock:
+            self._cursor = max(self._cursor or 0, cursor)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "cursor": self._cursor,
+            }
+
+
+admin_cells = AdminCellCache(ADMIN_CELL_CACHE_MAX)
+
+
+def load_admin_cell(session: Session, desk_id: int, day: date) -> Markup:
+    """One desk's admin grid cell, from admin_cells or rendered from the DB."""
+    cell = admin_cells.get(desk_id, day)
+    if cell is not None:
+        return cell
+    version = admin_cells.version(desk_id)
+    desk = session.get(Desk, desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
+    slots = dict(session.exec(
+        select(Booking.slot, Booking.booked_by).where(Booking.day == day, Booking.desk_id == desk_id)
+    ).all())
+    cov = find_active_coverage(session, desk_id, day)
+    cell = render_admin_cell(
+        desk,
+        day,
+        admin_query(day, desk.floor_id),
+        slots.get(Slot.AM),
+        slots.get(Slot.PM),
+        (cov.start_day, cov.end_day, cov.temp_occupant) if cov else None,
+    )
+    admin_cells.put(desk_id, day, version, cell)
+    return cell
+
+
+def admin_form_response(request: Request, session: Session, desk_id: int, day: date, floor: Optional[int]) -> Response:
+    """
+    Reply to an admin grid form post, after its commit. The grid's script
+    (X-Admin-Fragment header) gets just the desk's re-rendered cell to swap
+    in; a plain form post is redirected back to the page.
     """
-    return HTMLResponse(content=html)
+    admin_cells.invalidate_desks([desk_id])
+    if request.headers.get("x-admin-fragment"):
+        return HTMLResponse(content=load_admin_cell(session, desk_id, day))
+    return RedirectResponse(url=admin_desks_url(day, floor), status_code=303)
+
+
+@app.get("/admin/desks", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
+def admin_desks(
+    day: date = Query(..., description="YYYY-MM-DD"),
+    floor: Optional[int] = Query(None, description="Floor id; the first floor if omitted"),
+    session: Session = Depends(get_session),
+):
+    """
+    Admin grid page (one floor at a time):
+    - Change desk type + label
+    - Edit holder_name for STAFF desks
+    - Set vacation coverage (start/end + temp occupant)
+    - Shows AM/PM bookings for THESIS desks
+    - Shows current occupant / away badge for STAFF desks
+
+    Streamed row by row. Cells of unchanged desks come from admin_cells;
+    bookings and coverages are only read for the desks whose cell missed.
+    """
+    admin_cells.sync(session)
+    floors = session.exec(select(Floor).order_by(Floor.id)).all()
+    current = require_floor(session, floor) if floor is not None else (floors[0] if floors else None)
+    floor_id = current.id if current else None
+    query = admin_query(day, floor_id)
+
+    # Plain rows, not ORM objects: the page is rendered after the session is closed.
+    desks = session.exec(
+        select(Desk.id, Desk.row, Desk.col, Desk.desk_type, Desk.label, Desk.holder_name)
+        .where(Desk.floor_id == floor_id)
+        .order_by(Desk.row, Desk.col)
+    ).all()
+
+    cells: Dict[int, Markup] = {}
+    versions: Dict[int, Tuple[int, int]] = {}
+    for d in desks:
+        cell = admin_cells.get(d.id, day)
+        if cell is None:
+            versions[d.id] = admin_cells.version(d.id)
+        else:
+            cells[d.id] = cell
+
+    booking_idx: Dict[Tuple[int, Slot], str] = {}
+    active_cov: Dict[int, Tuple[date, date, str]] = {}
+    if versions:
+        missed = list(versions) if len(versions) <= 500 else floor_desk_ids(floor_id)
+        for desk_id, slot, booked_by in session.exec(
+            select(Booking.desk_id, Booking.slot, Booking.booked_by)
+            .where(Booking.day == day, Booking.desk_id.in_(missed))
+        ).all():
+            booking_idx[(desk_id, slot)] = booked_by
+        active_cov = {
+            desk_id: (c.start_day, c.end_day, c.temp_occupant)
+            for desk_id, c in load_active_coverages(session, day, missed).items()
+        }
+
+    # Sized from the floor, grown to fit any desk placed outside it.
+    n_rows = max([current.rows if current else 0] + [d.row + 1 for d in desks])
+    n_cols = max([current.cols if current else 0] + [d.col + 1 for d in desks])
+    grid = {(d.row, d.col): d for d in desks}
+
+    floor_links = Markup(" · ".join(
+        ADMIN_FLOOR_CURRENT.render(name=f.name) if f.id == floor_id
+        else ADMIN_FLOOR_LINK.render(query=admin_query(day, f.id), name=f.name)
+        for f in floors
+    ) or "No floors yet (POST /floors).")
+    head = ADMIN_PAGE_HEAD.render(
+        day=day.isoformat(),
+        floor_links=floor_links,
+        floor_input=ADMIN_FLOOR_INPUT.render(floor=floor_id) if floor_id is not None else Markup(""),
+    )
+
+    def page():
+        yield head
+        for r in range(n_rows):
+            row = ["<tr>"]
+            for c in range(n_cols):
+                d = grid.get((r, c))
+                if d is None:
+                    row.append(ADMIN_EMPTY_CELL)
+                    continue
+                cell = cells.get(d.id)
+                if cell is None:
+                    cell = render_admin_cell(
+                        d,
+                        day,
+                        query,
+                        booking_idx.get((d.id, Slot.AM)),
+                        booking_idx.get((d.id, Slot.PM)),
+                        active_cov.get(d.id),
+                    )
+                    admin_cells.put(d.id, day, versions[d.id], cell)
+                row.append(cell)
+            row.append("</tr>")
+            yield "".join(row)
+        yield ADMIN_PAGE_TAIL
+
+    return StreamingResponse(page(), media_type="text/html")
+
+
+@app.get("/admin/desks/{desk_id}/cell", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
+def admin_desk_cell(
+    desk_id: int,
+    day: date = Query(..., description="YYYY-MM-DD"),
+    session: Session = Depends(get_session),
+):
+    """Just one desk's <td> of the /admin/desks grid, for refreshing it in place."""
+    admin_cells.sync(session)
+    return HTMLResponse(content=load_admin_cell(session, desk_id, day))
 
 
 @app.post("/admin/desks/{desk_id}", dependencies=[Depends(require_admin)])
 def admin_update_desk(
+    request: Request,
     desk_id: int,
     day: date = Query(...),
+    floor: Optional[int] = Query(None),
     desk_type: str = Form(...),
     label: str = Form(...),
     holder_name: str = Form(""),
+    session: Session = Depends(get_session),
 ):
     if desk_type not in {"staff", "tesisti", "bloccata"}:
         raise HTTPException(status_code=400, detail="Invalid desk_type.")
@@ -1176,42 +4311,50 @@ def admin_update_desk(
     label = (label or "").strip()
     holder_name = (holder_name or "").strip()
 
-    with Session(engine) as session:
-        desk = session.get(Desk, desk_id)
-        if not desk:
-            raise HTTPException(status_code=404, detail="Desk not found.")
+    desk = session.get(Desk, desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
 
-        old_type = desk.desk_type
-        new_type = DeskType(desk_type)
+    old_type = desk.desk_type
+    new_type = DeskType(desk_type)
 
-        desk.desk_type = new_type
-        desk.label = label or desk.label
+    desk.desk_type = new_type
+    desk.label = label or desk.label
 
-        if new_type == DeskType.STAFF:
-            desk.holder_name = holder_name or desk.holder_name or f"Holder {desk.label}"
-        else:
-            # Keep holder_name in DB or clear it—your choice. Here we keep it.
-            # desk.holder_name = desk.holder_name
-            pass
+    if new_type == DeskType.STAFF:
+        desk.holder_name = holder_name or desk.holder_name or f"Holder {desk.label}"
+    else:
+        # Keep holder_name in DB or clear it—your choice. Here we keep it.
+        # desk.holder_name = desk.holder_name
+        pass
 
-        # Auto-cancel bookings if leaving THESIS
-        if old_type == DeskType.THESIS and new_type != DeskType.THESIS:
-            delete_all_bookings_for_desk(session, desk_id)
+    # Auto-cancel bookings if leaving THESIS
+    bookings_cleared = False
+    if old_type == DeskType.THESIS and new_type != DeskType.THESIS:
+        bookings_cleared = delete_all_bookings_for_desk(session, desk_id) > 0
 
-        session.add(desk)
-        session.commit()
+    session.add(desk)
+    record_change(session, desk_event(desk, bookings_cleared))
+    bump_versions(session, [GLOBAL_VERSION_DAY])
+    session.commit()
 
-    return RedirectResponse(url=f"/admin/desks?day={day.isoformat()}", status_code=303)
+    desk_cache.invalidate_all()
+    event_hub.notify()
+
+    return admin_form_response(request, session, desk_id, day, floor)
 
 
 @app.post("/admin/coverages", dependencies=[Depends(require_admin)])
 def admin_add_coverage(
+    request: Request,
     day: date = Query(...),
+    floor: Optional[int] = Query(None),
     desk_id: int = Form(...),
     start_day: str = Form(...),
     end_day: str = Form(...),
     temp_occupant: str = Form(...),
     note: str = Form(""),
+    session: Session = Depends(get_session),
 ):
     try:
         s = date.fromisoformat(start_day)
@@ -1223,29 +4366,42 @@ def admin_add_coverage(
     if e < s:
         raise HTTPException(status_code=400, detail="End date must be >= start date.")
 
-    with Session(engine) as session:
-        desk = session.get(Desk, desk_id)
-        if not desk:
-            raise HTTPException(status_code=404, detail="Desk not found.")
-        if desk.desk_type != DeskType.STAFF:
-            raise HTTPException(status_code=400, detail="Coverage can only be set for STAFF desks.")
+    desk = session.get(Desk, desk_id)
+    if not desk:
+        raise HTTPException(status_code=404, detail="Desk not found.")
+    if desk.desk_type != DeskType.STAFF:
+        raise HTTPException(status_code=400, detail="Coverage can only be set for STAFF desks.")
 
-        if check_coverage_overlap(session, desk_id, s, e):
-            raise HTTPException(status_code=409, detail="Coverage overlaps an existing one for this desk.")
+    cov = StaffCoverage(desk_id=desk_id, start_day=s, end_day=e, temp_occupant=temp_occupant, note=note or "")
+    event = insert_coverage(session, cov)
+    if event is None:
+        raise HTTPException(status_code=409, detail="Coverage overlaps an existing one for this desk.")
+    session.commit()
 
-        cov = StaffCoverage(desk_id=desk_id, start_day=s, end_day=e, temp_occupant=temp_occupant, note=note or "")
-        session.add(cov)
-        session.commit()
+    desk_cache.invalidate_range(s, e)
+    event_hub.notify()
 
-    return RedirectResponse(url=f"/admin/desks?day={day.isoformat()}", status_code=303)
+    return admin_form_response(request, session, desk_id, day, floor)
 
 
 @app.post("/admin/coverages/clear", dependencies=[Depends(require_admin)])
-def admin_clear_coverages(desk_id: int = Query(...), day: date = Query(...)):
-    with Session(engine) as session:
-        rows = session.exec(select(StaffCoverage).where(StaffCoverage.desk_id == desk_id)).all()
-        for r in rows:
-            session.delete(r)
-        session.commit()
-
-    return RedirectResponse(url=f"/admin/desks?day={day.isoformat()}", status_code=303)
+def admin_clear_coverages(
+    request: Request,
+    desk_id: int = Query(...),
+    day: date = Query(...),
+    floor: Optional[int] = Query(None),
+    session: Session = Depends(get_session),
+):
+    rows = session.exec(select(StaffCoverage).where(StaffCoverage.desk_id == desk_id)).all()
+    ranges = [(r.start_day, r.end_day) for r in rows]
+    for s, e in ranges:
+        record_change(session, coverage_event("coverage_removed", desk_id, s, e))
+    for r in rows:
+        session.delete(r)
+        bump_range_versions(session, r.start_day, r.end_day)
+    session.commit()
+    if ranges:
+        desk_cache.invalidate_range(min(s for s, _ in ranges), max(e for _, e in ranges))
+        event_hub.notify()
+
+    return admin_form_response(request, session, desk_id, day, floor)
@@ -0,0 +1,66 @@
+"""
+Every test module shares one imported `main`, configured here for a
+throwaway SQLite file. The `client` fixture starts each test on an empty
+database with fresh per-worker caches and runs the app's lifespan.
+"""
+import base64
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+DB_DIR = tempfile.mkdtemp(prefix="vlsi-booking-test-")
+DB_PATH = os.path.join(DB_DIR, "booking.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["PWD_HASH_WORKERS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+ADMIN = {"Authorization": "Basic " + base64.b64encode(f"{main.ADMIN_USER}:{main.ADMIN_PASS}".encode()).decode()}
+
+
+def reset_database() -> None:
+    """Deletes the database file and the in-process state derived from it."""
+    main.engine.dispose()
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(DB_PATH + suffix)
+        except FileNotFoundError:
+            pass
+    # Cursors and versions restart with the new file, so these must too.
+    main.token_cache = main.TokenCache(main.TOKEN_CACHE_MAX, main.TOKEN_CACHE_TTL_SECONDS, main.TOKEN_CACHE_SYNC_MS)
+    main.desk_cache = main.DeskStatusCache(main.DESK_CACHE_MAX_DAYS, main.DESK_CACHE_TTL_SECONDS)
+    main.admin_cells = main.AdminCellCache(main.ADMIN_CELL_CACHE_MAX)
+    main.event_hub = main.EventHub(main.EVENTS_QUEUE_SIZE, main.EVENTS_MAX_SUBSCRIBERS, main.EVENTS_POLL_MS)
+
+
+def signup(client: TestClient, username: str) -> dict:
+    """Signs `username` up and returns its Authorization header."""
+    r = client.post("/auth/signup", json={"username": username, "password": "password1"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": "Bearer " + r.json()["token"]}
+
+
+@pytest.fixture
+def client():
+    reset_database()
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _remove_db_dir():
+    yield
+    main.engine.dispose()
+    shutil.rmtree(DB_DIR, ignore_errors=True)
+
+
+def thesis_desks(client: TestClient, headers: dict, day: str) -> list:
+    """Ids of the bookable desks on `day`."""
+    desks = client.get("/desks", params={"day": day}, headers=headers).json()
+    return [d["id"] for d in desks if d["desk_type"] == main.DeskType.THESIS.value]
@@ -0,0 +1,63 @@
+"""Bearer token cache: revocations made elsewhere are honored."""
+from sqlmodel import Session, select
+
+import main
+from conftest import signup
+
+MINE = {"start": "2030-01-01", "end": "2030-01-07"}
+
+
+def revoke_on_another_worker(username: str, token=None) -> None:
+    # What a revocation on another worker leaves behind: the DB change and
+    # its log row, but nothing evicted from this worker's token_cache.
+    with Session(main.engine) as session:
+        q = select(main.AuthToken).where(main.AuthToken.username == username)
+        if token is not None:
+            q = q.where(main.AuthToken.token == token)
+        for row in session.exec(q).all():
+            session.delete(row)
+        main.revoke_tokens(session, username, token)
+        session.commit()
+
+
+def test_logout_elsewhere_revokes_cached_token(client):
+    main.token_cache = main.TokenCache(100, 60, 0)
+    h = signup(client, "alice")
+    token = h["Authorization"].split()[1]
+    assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 200
+    assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 200
+    assert main.token_cache.stats()["hits"] >= 1
+
+    revoke_on_another_worker("alice", token)
+    assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 401
+
+
+def test_user_wide_revocation_evicts_every_token(client):
+    main.token_cache = main.TokenCache(100, 60, 0)
+    h1 = signup(client, "alice")
+    h2 = {"Authorization": "Bearer " + client.post(
+        "/auth/login", json={"username": "alice", "password": "password1"}
+    ).json()["token"]}
+    bob = signup(client, "bob")
+    for h in (h1, h2, bob):
+        assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 200
+
+    revoke_on_another_worker("alice")
+    assert client.get("/bookings/mine", params=MINE, headers=h1).status_code == 401
+    assert client.get("/bookings/mine", params=MINE, headers=h2).status_code == 401
+    assert client.get("/bookings/mine", params=MINE, headers=bob).status_code == 200
+
+
+def test_cached_token_trusted_within_sync_window(client):
+    main.token_cache = main.TokenCache(100, 60, 60_000)
+    h = signup(client, "alice")
+    token = h["Authorization"].split()[1]
+    assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 200
+
+    revoke_on_another_worker("alice", token)
+    # The documented relaxation: up to TOKEN_CACHE_SYNC_MS of grace...
+    assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 200
+    # ...until the next sync.
+    with Session(main.engine) as session:
+        main.token_cache.sync(session)
+    assert client.get("/bookings/mine", params=MINE, headers=h).status_code == 401
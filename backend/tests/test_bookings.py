@@ -0,0 +1,121 @@
+"""Booking writes and the reads clients cache: conflicts, batches, ETags and paging."""
+import threading
+import time
+
+import pytest
+
+import main
+from conftest import signup, thesis_desks
+
+DAY = "2030-01-07"
+
+
+def book(client, headers, desk, day=DAY, **slots):
+    return client.post("/bookings", json={"desk_id": desk, "day": day, "booked_by": "-", **slots}, headers=headers)
+
+
+@pytest.fixture
+def group_commit(client):
+    """Swaps in a booking write queue with a window wide enough to batch a test's requests."""
+    queue = main.BookingWriteQueue(300, 10)
+    saved, main.booking_writes = main.booking_writes, queue
+    try:
+        yield queue
+    finally:
+        main.booking_writes = saved
+        queue.shutdown()
+
+
+def test_group_commit_resolves_conflicts_in_arrival_order(client, group_commit):
+    users = [signup(client, name) for name in ("alice", "bob", "carol")]
+    desk = thesis_desks(client, users[0], DAY)[0]
+
+    statuses = {}
+
+    def request(i):
+        statuses[i] = book(client, users[i], desk).status_code
+
+    threads = []
+    for i in range(len(users)):
+        threads.append(threading.Thread(target=request, args=(i,)))
+        threads[-1].start()
+        time.sleep(0.05)  # well inside the window, but in a known order
+    for t in threads:
+        t.join()
+
+    assert statuses == {0: 200, 1: 409, 2: 409}
+    assert group_commit.stats()["largest_batch"] == 3
+    desks = client.get("/desks", params={"day": DAY}, headers=users[0]).json()
+    assert next(d for d in desks if d["id"] == desk)["booking_am"] == "alice"
+
+
+def test_desks_etag_changes_only_with_the_day(client):
+    h = signup(client, "alice")
+    desk, other = thesis_desks(client, h, DAY)[:2]
+    r = client.get("/desks", params={"day": DAY}, headers=h)
+    etag = r.headers["etag"]
+
+    r = client.get("/desks", params={"day": DAY}, headers={**h, "If-None-Match": etag})
+    assert r.status_code == 304
+    # A booking on another day leaves this one's ETag alone.
+    assert book(client, h, other, day="2030-01-08").status_code == 200
+    r = client.get("/desks", params={"day": DAY}, headers={**h, "If-None-Match": etag})
+    assert r.status_code == 304
+
+    assert book(client, h, desk).status_code == 200
+    r = client.get("/desks", params={"day": DAY}, headers={**h, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert next(d for d in r.json() if d["id"] == desk)["booking_am"] == "alice"
+
+
+@pytest.mark.parametrize("all_or_nothing", [False, True])
+def test_batch_with_a_conflict(client, all_or_nothing):
+    alice, bob = signup(client, "alice"), signup(client, "bob")
+    taken, free = thesis_desks(client, alice, DAY)[:2]
+    assert book(client, bob, taken).status_code == 200
+
+    items = [
+        {"desk_id": free, "day": DAY, "slot": "AM"},
+        {"desk_id": taken, "day": DAY, "slot": "AM"},
+        {"desk_id": free, "day": DAY, "slot": "PM"},
+    ]
+    r = client.post("/bookings/batch", json={"items": items, "all_or_nothing": all_or_nothing}, headers=alice)
+    assert r.status_code == 200, r.text
+    out = r.json()
+
+    assert out["ok"] is False
+    if all_or_nothing:
+        assert [x["status"] for x in out["results"]] == ["skipped", "conflict", "skipped"]
+        assert out["created"] == 0
+    else:
+        assert [x["status"] for x in out["results"]] == ["created", "conflict", "created"]
+        assert out["created"] == 2
+    mine = client.get("/bookings/mine", params={"start": DAY, "end": DAY}, headers=alice).json()
+    assert len(mine["bookings"]) == out["created"]
+
+
+def test_my_bookings_cursor_survives_inserts(client):
+    h = signup(client, "alice")
+    desk = thesis_desks(client, h, DAY)[0]
+    for day in ("2030-01-07", "2030-01-08", "2030-01-10"):
+        assert book(client, h, desk, day=day, am=True, pm=True).status_code == 200
+    params = {"start": "2030-01-01", "end": "2030-01-31", "limit": 3}
+
+    first = client.get("/bookings/mine", params=params, headers=h).json()
+    assert [(b["day"], b["slot"]) for b in first["bookings"]] == [
+        ("2030-01-07", "AM"), ("2030-01-07", "PM"), ("2030-01-08", "AM"),
+    ]
+
+    # Bookings before and after the cursor: the next page neither repeats
+    # nor skips anything, and picks up the later one.
+    assert book(client, h, desk, day="2030-01-02").status_code == 200
+    assert book(client, h, desk, day="2030-01-09").status_code == 200
+
+    rest = []
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get("/bookings/mine", params={**params, "after": cursor}, headers=h).json()
+        rest += [(b["day"], b["slot"]) for b in page["bookings"]]
+        cursor = page["next_cursor"]
+    assert rest == [("2030-01-08", "PM"), ("2030-01-09", "AM"), ("2030-01-10", "AM"), ("2030-01-10", "PM")]
@@ -0,0 +1,48 @@
+"""GET /changes: cursors never skip a change, however its transaction interleaves."""
+from sqlmodel import Session
+
+import main
+from conftest import signup, thesis_desks
+
+DAY = "2030-01-07"
+
+
+def changes_since(client, headers, cursor):
+    r = client.get("/changes", params={"since": cursor}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_slow_commit_shows_up_after_the_cursor(client):
+    h = signup(client, "alice")
+    desk = thesis_desks(client, h, DAY)[0]
+    start = changes_since(client, h, 0)["cursor"]
+
+    # A transaction records its change, then stays open while another one
+    # commits; flushing used to take the row's id right here.
+    slow = Session(main.engine)
+    main.record_change(slow, {"type": "resync"})
+    slow.flush()
+
+    r = client.post("/bookings", json={"desk_id": desk, "day": DAY, "booked_by": "alice"}, headers=h)
+    assert r.status_code == 200, r.text
+    page = changes_since(client, h, start)
+    assert [c["type"] for c in page["changes"]] == ["booking_created"]
+
+    slow.commit()
+    slow.close()
+    later = changes_since(client, h, page["cursor"])
+    assert [c["type"] for c in later["changes"]] == ["resync"]
+    assert later["cursor"] > page["cursor"]
+
+
+def test_rolled_back_change_is_not_logged(client):
+    h = signup(client, "alice")
+    start = changes_since(client, h, 0)["cursor"]
+
+    with Session(main.engine) as session:
+        main.record_change(session, {"type": "resync"})
+        session.rollback()
+        session.commit()
+
+    assert changes_since(client, h, start)["changes"] == []
@@ -0,0 +1,40 @@
+"""Retention cleanup: purging old bookings only invalidates the purged days."""
+from datetime import date, timedelta
+
+from sqlmodel import Session
+
+import main
+from conftest import signup, thesis_desks
+
+DAY = "2030-01-07"
+
+
+def desks_etag(client, headers, day):
+    r = client.get("/desks", params={"day": day}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.headers["etag"]
+
+
+def test_purge_leaves_other_days_cached(client):
+    h = signup(client, "alice")
+    desk = thesis_desks(client, h, DAY)[0]
+    r = client.post("/bookings", json={"desk_id": desk, "day": DAY, "booked_by": "alice"}, headers=h)
+    assert r.status_code == 200, r.text
+
+    old_day = date.today() - timedelta(days=main.BOOKINGS_RETENTION_DAYS + 30)
+    with Session(main.engine) as session:
+        session.add(main.Booking(desk_id=desk, day=old_day, slot="AM", booked_by="alice"))
+        main.bump_versions(session, [old_day])
+        session.commit()
+    live = desks_etag(client, h, DAY)
+    old = desks_etag(client, h, old_day.isoformat())
+    entries = main.desk_cache.stats()["entries"]
+
+    purged = main.cleanup_old_data()["phases"]["old_bookings"]
+    assert (purged["deleted"], purged["days"]) == (1, 1)
+
+    # The live day keeps its version and its cached snapshot.
+    r = client.get("/desks", params={"day": DAY}, headers={**h, "If-None-Match": live})
+    assert r.status_code == 304
+    assert main.desk_cache.stats()["entries"] == entries - 1
+    assert desks_etag(client, h, old_day.isoformat()) != old
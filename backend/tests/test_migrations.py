@@ -0,0 +1,133 @@
+"""
+Upgrades a database created by the first release of the schema and checks
+that the hot queries still use their indexes afterwards, and that invariants
+older data may break are reported instead of being assumed.
+"""
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import DB_PATH, reset_database
+
+# Schema as created by SQLModel before versioned migrations existed.
+BASELINE_SCHEMA = """
+CREATE TABLE desk (
+    id INTEGER NOT NULL, "row" INTEGER NOT NULL, col INTEGER NOT NULL,
+    desk_type VARCHAR(7) NOT NULL, label VARCHAR NOT NULL, holder_name VARCHAR(80),
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_desk_holder_name ON desk (holder_name);
+CREATE INDEX ix_desk_desk_type ON desk (desk_type);
+CREATE TABLE authtoken (
+    token VARCHAR NOT NULL, username VARCHAR(80) NOT NULL,
+    created_at DATETIME NOT NULL, expires_at DATETIME NOT NULL,
+    PRIMARY KEY (token)
+);
+CREATE INDEX ix_authtoken_username ON authtoken (username);
+CREATE INDEX ix_authtoken_created_at ON authtoken (created_at);
+CREATE INDEX ix_authtoken_expires_at ON authtoken (expires_at);
+CREATE TABLE user (
+    username VARCHAR(80) NOT NULL, password_salt_hex VARCHAR(64) NOT NULL,
+    password_hash_hex VARCHAR(128) NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (username)
+);
+CREATE INDEX ix_user_created_at ON user (created_at);
+CREATE TABLE booking (
+    id INTEGER NOT NULL, desk_id INTEGER NOT NULL, day DATE NOT NULL,
+    slot VARCHAR(2) NOT NULL, booked_by VARCHAR(80) NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_desk_day_slot UNIQUE (desk_id, day, slot),
+    CONSTRAINT uq_person_day_slot UNIQUE (booked_by, day, slot),
+    FOREIGN KEY(desk_id) REFERENCES desk (id)
+);
+CREATE INDEX ix_booking_day ON booking (day);
+CREATE INDEX ix_booking_slot ON booking (slot);
+CREATE INDEX ix_booking_desk_id ON booking (desk_id);
+CREATE INDEX ix_booking_booked_by ON booking (booked_by);
+CREATE TABLE staffcoverage (
+    id INTEGER NOT NULL, desk_id INTEGER NOT NULL, start_day DATE NOT NULL,
+    end_day DATE NOT NULL, temp_occupant VARCHAR(80) NOT NULL, note VARCHAR(200) NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(desk_id) REFERENCES desk (id)
+);
+CREATE INDEX ix_staffcoverage_desk_id ON staffcoverage (desk_id);
+CREATE INDEX ix_staffcoverage_end_day ON staffcoverage (end_day);
+CREATE INDEX ix_staffcoverage_temp_occupant ON staffcoverage (temp_occupant);
+CREATE INDEX ix_staffcoverage_start_day ON staffcoverage (start_day);
+INSERT INTO desk (id, "row", col, desk_type, label, holder_name) VALUES
+    (1, 0, 0, 'THESIS', 'A1', NULL), (2, 0, 1, 'THESIS', 'A2', NULL);
+INSERT INTO booking (desk_id, day, slot, booked_by) VALUES
+    (1, '2030-01-07', 'AM', 'alice'), (1, '2030-01-07', 'PM', 'alice');
+"""
+
+# What ANALYZE on those two bookings leaves behind: "every day has two rows".
+STALE_STATS = [
+    ("booking", "ix_booking_day_slot_desk", "2 2 1 1"),
+    ("booking", "sqlite_autoindex_booking_1", "2 2 2 1"),
+    ("booking", "sqlite_autoindex_booking_2", "2 2 2 1"),
+]
+
+
+@pytest.fixture
+def baseline_db():
+    reset_database()
+    con = sqlite3.connect(DB_PATH)
+    con.executescript(BASELINE_SCHEMA)
+    con.close()
+    return DB_PATH
+
+
+def test_upgrade_keeps_hot_queries_on_indexes(baseline_db):
+    with TestClient(main.app):
+        pass
+    assert main.schema_report["version"] == main.MIGRATIONS[-1][0]
+    assert main.schema_report["full_scans"] == []
+
+
+def test_stale_statistics_are_refreshed(baseline_db):
+    with TestClient(main.app):
+        pass
+
+    # Statistics taken while booking had two rows, which it has long outgrown.
+    first = date(2030, 2, 1)
+    con = sqlite3.connect(baseline_db)
+    con.executemany(
+        "INSERT INTO booking (desk_id, day, slot, booked_by) VALUES (?, ?, ?, ?)",
+        [(2, (first + timedelta(days=i)).isoformat(), "AM", f"user{i}") for i in range(2000)],
+    )
+    con.execute("ANALYZE")
+    con.execute("DELETE FROM sqlite_stat1")
+    con.executemany("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)", STALE_STATS)
+    con.commit()
+    con.close()
+    main.engine.dispose()
+    assert main.schema_self_check()["full_scans"]
+
+    assert main.refresh_planner_stats() == {"analyzed": ["booking"]}
+    assert main.schema_self_check()["full_scans"] == []
+    # Up to date now: the next refresh leaves them (and the pool) alone.
+    assert main.refresh_planner_stats() == {"analyzed": []}
+
+
+def test_upgrade_refuses_overlapping_coverages(baseline_db):
+    con = sqlite3.connect(baseline_db)
+    con.executescript("""
+        INSERT INTO staffcoverage (id, desk_id, start_day, end_day, temp_occupant, note) VALUES
+            (1, 1, '2030-01-01', '2030-01-31', 'bob', ''),
+            (2, 1, '2030-01-20', '2030-02-10', 'carol', ''),
+            (3, 2, '2030-01-01', '2030-01-31', 'dave', '');
+    """)
+    con.close()
+
+    with pytest.raises(RuntimeError, match=r"1 overlapping coverage pair\(s\): desk 1: coverages 1 and 2\."):
+        main.run_migrations()
+    con = sqlite3.connect(baseline_db)
+    assert 6 not in {v for (v,) in con.execute("SELECT version FROM schemamigration")}
+
+    con.execute("UPDATE staffcoverage SET start_day = '2030-02-01' WHERE id = 2")
+    con.commit()
+    con.close()
+    assert main.run_migrations() == [6]